@@ -7,10 +7,13 @@ import json
 import plotly.express as px
 import plotly.graph_objects as go
 import utils
-from sections import venue_section, leaderboard, datewise_stats
+from sections import venue_section, leaderboard, datewise_stats, synergy_section, data_status, debug_panel
+import instrumentation
 import media.icon_constants as icons
 
 st.set_page_config(layout="wide")
+instrumentation.start_run("app")
+utils.start_background_refresh()
 
 sidebar = st.sidebar
 
@@ -25,12 +28,18 @@ st.markdown(f"<h3>Total Games Played: {df.shape[0]}</h3>", unsafe_allow_html=Tru
 all_players = list(np.unique(df[["team_1_player_1", "team_1_player_2", "team_2_player_1", "team_2_player_2"]].values))
 
 st.markdown(f"<hr><h5>{icons.LEADERBOARD}&nbsp;Leaderboard</h5>", unsafe_allow_html=True)
-leaderboard.display_leaderboard(df, all_players)
+leaderboard.display_leaderboard(utils.get_player_games(), all_players, utils.get_ratings(), utils.get_rolling_stats())
+
+st.markdown(f"<hr><h5>{icons.TEAMMATE}&nbsp;Partner Synergy</h5>", unsafe_allow_html=True)
+synergy_section.display_synergy_heatmap(utils.get_partner_synergy(), all_players)
 
 st.markdown(f"<hr><h5>{icons.CALENDAR}&nbsp;Date Wise stats</h5>", unsafe_allow_html=True)
-datewise_stats.display_date_section(df)
+datewise_stats.display_date_section(utils.get_aggregate_cube())
 
 st.markdown(f"<hr><h5>{icons.STADIUM}&nbsp;Venue Wise stats</h5>", unsafe_allow_html=True)
-venue_section.display_venue_stats(df)
+venue_section.display_venue_stats(utils.get_aggregate_cube())
+
+st.markdown("<hr>", unsafe_allow_html=True)
 
-st.markdown("<hr>", unsafe_allow_html=True)
\ No newline at end of file
+data_status.display_data_status()
+debug_panel.display_debug_panel()
@@ -0,0 +1,45 @@
+import random
+import threading
+import time
+
+
+class BackgroundRefresher:
+    # Daemon thread that runs `refresh()` every `interval` seconds, so sessions read
+    # what is already cached instead of waiting on the sheet. A failed refresh (quota
+    # errors included) is retried with jittered backoff, doubling up to
+    # `max_retry_delay`, and the jitter keeps several processes from refreshing in step.
+
+    def __init__(self, refresh, interval, max_retry_delay=600):
+        self.refresh = refresh
+        self.interval = interval
+        self.max_retry_delay = max_retry_delay
+        self.stats = {"refreshes": 0, "failures": 0, "last_error": None}
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def start(self):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="background-refresher", daemon=True)
+                self._worker.start()
+
+    def is_running(self):
+        with self._lock:
+            return self._worker is not None
+
+    def _run(self):
+        delay = self.interval
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                with self._lock:
+                    self.stats["failures"] += 1
+                    self.stats["last_error"] = repr(e)
+                delay = min(delay * 2, self.max_retry_delay)
+            else:
+                with self._lock:
+                    self.stats["refreshes"] += 1
+                delay = self.interval
+
+            time.sleep(delay * random.uniform(0.8, 1.2))
@@ -0,0 +1,65 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import utils
+from engine.attendance import Attendance
+from engine.expenses import get_player_shares
+from benchmarks.synthetic import generate_workbook
+
+
+def legacy_players_on_date(df: pd.DataFrame):
+    players_on_date = df[['date', 'team_1_player_1', 'team_1_player_2', 'team_2_player_1', 'team_2_player_2']].copy()
+
+    players_on_date = players_on_date.groupby("date").agg({
+        'team_1_player_1': 'unique',
+        'team_1_player_2': 'unique',
+        'team_2_player_1': 'unique',
+        'team_2_player_2': 'unique'
+    })
+
+    players_on_date['players'] = players_on_date[['team_1_player_1', 'team_1_player_2', 'team_2_player_1', 'team_2_player_2']].apply(
+        lambda x: [i for i in set(', '.join([', '.join(x[i]) for i in range(4)]).split(', ')) if i != 'other'], 
+        axis=1
+    )
+    players_on_date = players_on_date[['players']]
+    players_on_date['number_of_players'] = players_on_date['players'].str.len()
+    # expense sheets store dates as text
+    players_on_date.index = players_on_date.index.strftime("%Y-%m-%d").rename("date")
+
+    return players_on_date
+
+
+def legacy_player_shares(players_on_date_df, expenses_df):
+    player_share_df = pd.merge(players_on_date_df.explode('players'), expenses_df, how="inner", on="date")
+    player_share_df['share'] = player_share_df['amount'] / player_share_df['number_of_players']
+    return player_share_df
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the row-wise get_players_on_date against the attendance index")
+    parser.add_argument("--dates", type=int, nargs="+", default=[500, 2000, 10000])
+    parser.add_argument("--players", type=int, default=40)
+    parser.add_argument("--games-per-day", type=int, default=12)
+    args = parser.parse_args()
+
+    print(f"{'dates':>8} {'games':>8} {'legacy_s':>10} {'index_s':>10} {'speedup':>8}")
+    for dates in args.dates:
+        games = dates * args.games_per_day
+        workbook = generate_workbook(games, args.players, games_per_day=args.games_per_day)
+        df = utils.normalize_match_data(workbook["Form Responses 1"])
+        expenses_df = workbook["expense_tracker"]
+
+        legacy_df, legacy_s = timed(lambda: legacy_player_shares(legacy_players_on_date(df), expenses_df))
+        index_df, index_s = timed(lambda: get_player_shares(Attendance(df), expenses_df))
+
+        columns = ["date", "players", "share"]
+        legacy_df, index_df = [frame[columns].sort_values(columns[:2]).reset_index(drop=True) for frame in [legacy_df, index_df]]
+        pd.testing.assert_frame_equal(legacy_df, index_df, check_dtype=False)
+        print(f"{dates:>8} {games:>8} {legacy_s:>10.3f} {index_s:>10.3f} {legacy_s / index_s:>7.1f}x")
@@ -0,0 +1,56 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import utils
+from benchmarks.synthetic import generate_match_sheet
+
+
+def legacy_normalize_match_data(df):
+    df = df.drop(["result"], axis=1)
+
+    df.columns = ["timestamp", "date", "team_1_player_1", "team_1_player_2", "team_2_player_1", "team_2_player_2", "points_team_1", "points_team_2", "venue"]
+
+    df['winner'] = np.where(df.points_team_1 > df.points_team_2, 'team_1', 'team_2')
+    df['margin'] = abs(df.points_team_1 - df.points_team_2)
+    df['total_points_per_game'] = df["points_team_1"] + df["points_team_2"]
+    df['date'] = pd.to_datetime(df['date']).dt.strftime("%Y-%m-%d")
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+
+    df = df.applymap(lambda x: f'{x}'.lower().strip() if isinstance(x, str) else x)
+    df['point_bins'] = pd.cut(
+        df['total_points_per_game'],
+        [0, 30, 35, 40, 45, float("inf")],
+        right=False,
+        labels=['< 30', '30 - 35', '35 - 40', '40 - 45', "> 45"]
+    )
+
+    return df.sort_values("timestamp")
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare load time and memory of the applymap normalization against the typed loader")
+    parser.add_argument("--games", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--players", type=int, default=40)
+    args = parser.parse_args()
+
+    print(f"{'games':>8} {'legacy_s':>10} {'typed_s':>10} {'legacy_mb':>10} {'typed_mb':>10}")
+    for games in args.games:
+        raw = generate_match_sheet(games, args.players)
+        raw["Team 1 Player 1"] = " " + raw["Team 1 Player 1"].str.title()
+
+        legacy_df, legacy_s = timed(legacy_normalize_match_data, raw.copy())
+        typed_df, typed_s = timed(utils.normalize_match_data, raw.copy())
+
+        for col in legacy_df.columns:
+            legacy_values = pd.to_datetime(legacy_df[col]) if col == "date" else legacy_df[col]
+            assert (legacy_values.to_numpy() == typed_df[col].to_numpy()).all(), col
+
+        legacy_mb, typed_mb = [frame.memory_usage(deep=True).sum() / 2 ** 20 for frame in [legacy_df, typed_df]]
+        print(f"{games:>8} {legacy_s:>10.3f} {typed_s:>10.3f} {legacy_mb:>10.1f} {typed_mb:>10.1f}")
@@ -0,0 +1,84 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import utils
+from engine.leaderboard import compute_leaderboard
+from engine.player_games import build_player_games
+from benchmarks.synthetic import generate_match_sheet
+
+
+def legacy_player_stats(player, df):
+    player_matches = df[
+        np.where(
+            np.logical_or.reduce([df[i] == player for i in ["team_1_player_1", "team_1_player_2", "team_2_player_1", "team_2_player_2"]]),
+            True,
+            False
+        )
+    ].copy()
+
+    player_matches["belongs_to"] = np.where(
+        np.logical_or(
+            *[player_matches[i] == player for i in ["team_1_player_1", "team_1_player_2"]]
+        ),
+        'team_1',
+        'team_2'
+    )
+
+    player_matches['result'] = np.where(player_matches.belongs_to == player_matches.winner, "win", "loss")
+    player_matches['is_win'] = np.where(player_matches.result == "win", 1, 0)
+
+    return player_matches
+
+
+def legacy_leaderboard(df, players_list):
+    leaderboard = []
+
+    for player in players_list:
+        player_stats = legacy_player_stats(player, df)
+
+        total_games, wins = player_stats.shape[0], player_stats['is_win'].sum()
+        leaderboard.append({
+            "player": player,
+            "total_games": total_games,
+            "wins": wins,
+            "wins_pct": round(wins * 100 / total_games, 2),
+            "form": ' '.join(player_stats.iloc[-5:, :]['result'].apply(lambda x: x[0].upper()).to_list())[::-1]
+        })
+
+    return pd.DataFrame(leaderboard)
+
+
+def engine_leaderboard(df, players_list):
+    return compute_leaderboard(build_player_games(df), players_list)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the per-player leaderboard loop against the single pass engine")
+    parser.add_argument("--games", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--players", type=int, nargs="+", default=[20, 100, 500])
+    parser.add_argument("--skip-legacy-above", type=int, default=10 ** 6, help="skip the legacy loop when games x players exceeds this many thousand")
+    args = parser.parse_args()
+
+    print(f"{'games':>8} {'players':>8} {'legacy_s':>10} {'engine_s':>10} {'speedup':>8}")
+    for games in args.games:
+        for players in args.players:
+            df = utils.normalize_match_data(generate_match_sheet(games, players))
+            players_list = list(np.unique(df[["team_1_player_1", "team_1_player_2", "team_2_player_1", "team_2_player_2"]].values))
+
+            engine_df, engine_s = timed(engine_leaderboard, df, players_list)
+
+            if games * players / 1000 > args.skip_legacy_above:
+                print(f"{games:>8} {players:>8} {'-':>10} {engine_s:>10.3f} {'-':>8}")
+                continue
+
+            legacy_df, legacy_s = timed(legacy_leaderboard, df, players_list)
+            # the engine also reports streaks, which the legacy loop never had
+            pd.testing.assert_frame_equal(legacy_df, engine_df[legacy_df.columns], check_dtype=False)
+            print(f"{games:>8} {players:>8} {legacy_s:>10.3f} {engine_s:>10.3f} {legacy_s / engine_s:>7.1f}x")
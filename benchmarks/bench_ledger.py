@@ -0,0 +1,106 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import utils
+from engine.attendance import Attendance
+from engine.expenses import get_balances, explode_shuttle_expenses, get_player_shares
+from engine.ledger import net_positions
+from benchmarks.synthetic import generate_workbook
+
+
+def legacy_balances(player_share_df: pd.DataFrame, settlements_df: pd.DataFrame, shuttle_expenses: pd.DataFrame):
+    balances = player_share_df.groupby(['players', 'paid_by'][::-1]).agg({
+        'date': 'count',
+        'share': 'sum'
+    }).reset_index()
+
+    transformed_shuttle_expenses = shuttle_expenses[['paid_by', 'covered_for', 'expense_id', 'share']]
+    transformed_shuttle_expenses.columns = ['paid_by', 'players', 'date', 'share']
+
+    balances = pd.concat([balances, transformed_shuttle_expenses]).groupby(["paid_by", "players"]).agg({"share": "sum", "date": "min"}).reset_index()
+
+    balances = balances[balances['paid_by'] != balances['players']]
+
+    balances = pd.merge(
+        balances,
+        balances,
+        left_on=['paid_by', 'players'],
+        right_on=['players', 'paid_by'],
+        how="left"
+    )
+
+    balances['owes'] = np.where(
+        balances['paid_by_y'].isna(),
+        balances['share_x'],
+        np.where(
+            balances['share_x'] > balances['share_y'],
+            balances['share_x'] - balances['share_y'],
+            0
+        )
+    )
+
+    balances = balances[['players_x', 'paid_by_x', 'owes', 'date_x']]
+    balances.columns = ['player', 'owes_to', 'amount', 'for_days']
+
+    balances_post_settlement = pd.merge(
+        balances,
+        settlements_df,
+        left_on=['player', 'owes_to'],
+        right_on=['paid_by', 'paid_to'],
+        how = "left"
+    )
+
+    balances_post_settlement['amount'] = np.where(
+        balances_post_settlement['paid_to'].isna(),
+        balances_post_settlement['amount_x'],
+        np.where(
+            balances_post_settlement['amount_x'] > balances_post_settlement['amount_y'],
+            balances_post_settlement['amount_x'] - balances_post_settlement['amount_y'],
+            0
+        )
+    )
+
+    balances_post_settlement = balances_post_settlement[['player', 'owes_to', 'amount']].round(decimals=2)
+
+    return balances_post_settlement
+
+
+def implied_positions(balances):
+    # net position each player ends up with if every listed balance is paid
+    return net_positions(balances["player"], balances["owes_to"], balances["amount"])
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the pairwise merge balances against the netted ledger")
+    parser.add_argument("--players", type=int, nargs="+", default=[20, 100, 500])
+    parser.add_argument("--dates", type=int, default=1000, help="sessions with a court expense, about 3 years at one a day")
+    args = parser.parse_args()
+
+    print(f"{'players':>8} {'dates':>8} {'legacy_s':>10} {'ledger_s':>10} {'speedup':>8} {'legacy_n':>9} {'ledger_n':>9}")
+    for players in args.players:
+        workbook = generate_workbook(args.dates * 12, players)
+        df = utils.normalize_match_data(workbook["Form Responses 1"])
+        player_share_df = get_player_shares(Attendance(df), workbook["expense_tracker"])
+        shuttle_expenses = explode_shuttle_expenses(workbook["shuttle_expense_tracker"])
+        settlements_df = workbook["settlements"].groupby(["paid_by", "paid_to"]).sum("amount").reset_index()
+
+        legacy_df, legacy_s = timed(legacy_balances, player_share_df, settlements_df, shuttle_expenses)
+        ledger_df, ledger_s = timed(get_balances, player_share_df, settlements_df, shuttle_expenses)
+
+        # without settlements both sides must leave every player in the same net position,
+        # up to the legacy rounding of each pairwise balance
+        no_settlements = settlements_df.iloc[:0]
+        expected = implied_positions(legacy_balances(player_share_df, no_settlements, shuttle_expenses))
+        actual = implied_positions(get_balances(player_share_df, no_settlements, shuttle_expenses))
+        pd.testing.assert_series_equal(expected.sort_index(), actual.reindex(expected.index).fillna(0).sort_index(), atol=0.005 * players)
+        assert ledger_df.shape[0] < players
+
+        legacy_n = (legacy_df["amount"] > 0).sum()
+        print(f"{players:>8} {args.dates:>8} {legacy_s:>10.3f} {ledger_s:>10.3f} {legacy_s / ledger_s:>7.1f}x {legacy_n:>9} {ledger_df.shape[0]:>9}")
@@ -0,0 +1,103 @@
+import argparse
+import collections
+import json
+import random
+import threading
+import time
+import requests
+from fetch_sheets_data import QuotaAwareClient
+from rate_limiter import TokenBucket, priority, BACKGROUND, FOREGROUND
+
+# A stand-in for the Sheets API that enforces a per-window request quota with 429s
+# and fails a share of requests with a 503, so the limiter and the retries can be
+# exercised without a network. Time is scaled down: the window is one second.
+
+
+class FlakySession:
+
+    def __init__(self, quota, window=1.0, error_rate=0.02, latency=0.005, seed=0):
+        self.quota = quota
+        self.window = window
+        self.error_rate = error_rate
+        self.latency = latency
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.recent = collections.deque()
+        self.answers = collections.Counter()
+
+    def _respond(self, status, body):
+        response = requests.Response()
+        response.status_code = status
+        response._content = json.dumps(body).encode()
+        self.answers[status] += 1
+        return response
+
+    def request(self, endpoint, **kwargs):
+        time.sleep(self.latency)
+        with self.lock:
+            now = time.monotonic()
+            while self.recent and now - self.recent[0] > self.window:
+                self.recent.popleft()
+            if len(self.recent) >= self.quota:
+                return self._respond(429, {"error": {"code": 429, "message": "Quota exceeded", "status": "RESOURCE_EXHAUSTED"}})
+            self.recent.append(now)
+            if self.random.random() < self.error_rate:
+                return self._respond(503, {"error": {"code": 503, "message": "Service unavailable", "status": "UNAVAILABLE"}})
+            return self._respond(200, {"values": []})
+
+    get = post = put = delete = request
+
+
+def run(quota, requests_per_worker, foreground_workers, background_workers, limited):
+    session = FlakySession(quota)
+    counts = collections.Counter()
+    lock = threading.Lock()
+
+    def count(name, amount=1):
+        with lock:
+            counts[name] += amount
+
+    # the limiter runs a little under the quota; "unlimited" is the client without one
+    rate = quota * 0.9 if limited else 1e9
+    limiter = TokenBucket(rate, max(1, quota // 6) if limited else 1e9)
+    latencies = {FOREGROUND: [], BACKGROUND: []}
+
+    def worker(level):
+        client = QuotaAwareClient(None, limiter, count, session=session, max_retries=8, retry_delay=0.05, max_retry_delay=1)
+        with priority(level):
+            for _ in range(requests_per_worker):
+                start = time.perf_counter()
+                try:
+                    client.request("get", "https://sheets.example/values")
+                except Exception:
+                    count("errors_surfaced")
+                latencies[level].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker, args=(FOREGROUND,)) for _ in range(foreground_workers)]
+    threads += [threading.Thread(target=worker, args=(BACKGROUND,)) for _ in range(background_workers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return {
+        "limited": limited,
+        "seconds": round(time.perf_counter() - start, 3),
+        "answers": dict(session.answers),
+        "counters": {name: round(value, 3) for name, value in counts.items()},
+        "foreground_mean_ms": round(sum(latencies[FOREGROUND]) / max(len(latencies[FOREGROUND]), 1) * 1000, 1),
+        "background_mean_ms": round(sum(latencies[BACKGROUND]) / max(len(latencies[BACKGROUND]), 1) * 1000, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drive QuotaAwareClient against a fake API that returns 429s and 503s")
+    parser.add_argument("--quota", type=int, default=60, help="requests the fake accepts per second")
+    parser.add_argument("--requests", type=int, default=40, help="requests per worker")
+    parser.add_argument("--foreground", type=int, default=4)
+    parser.add_argument("--background", type=int, default=2)
+    args = parser.parse_args()
+
+    for limited in [False, True]:
+        print(json.dumps(run(args.quota, args.requests, args.foreground, args.background, limited)))
@@ -0,0 +1,81 @@
+import argparse
+import json
+import multiprocessing
+import tempfile
+import pandas as pd
+import utils
+from dataset_store import DatasetStore
+from benchmarks.synthetic import generate_workbook
+
+# Memory of N server processes that each hold the match table: normalized from the
+# raw rows (what every process did before, load transients included), as a private
+# copy of the finished frame (the floor for a per-process copy), or mapped from the
+# dataset store.
+# RSS counts shared pages in every process that touches them; PSS splits them
+# between the processes, so the PSS total is what the machine actually pays.
+
+
+def memory_kb():
+    with open("/proc/self/smaps_rollup") as f:
+        fields = dict(line.split(":", 1) for line in f if ":" in line and not line.startswith(" "))
+    return {name: int(fields[name].split()[0]) for name in ["Rss", "Pss"]}
+
+
+def hold_table(mode, directory, games, players, ready, done, results):
+    before = memory_kb()
+    if mode == "loaded":
+        df = utils.normalize_match_data(generate_workbook(games, players)["Form Responses 1"])
+    elif mode == "copied":
+        df = DatasetStore(directory).read("matches").copy(deep=True)
+    else:
+        df = DatasetStore(directory).read("matches")
+    # touch every column the way the pages' group-bys do
+    for col in df.columns:
+        values = df[col].cat.codes if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col]
+        values.to_numpy().view("u1").sum()
+
+    ready.wait()
+    after = memory_kb()
+    results.put({"mode": mode, "rss_mb": round((after["Rss"] - before["Rss"]) / 1024, 1), "pss_mb": round((after["Pss"] - before["Pss"]) / 1024, 1)})
+    done.wait()
+
+
+def run(mode, processes, games, players, directory):
+    ready = multiprocessing.Barrier(processes + 1)
+    done = multiprocessing.Barrier(processes + 1)
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=hold_table, args=(mode, directory, games, players, ready, done, results)) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    # every process holds its table before anyone measures, so shared pages are split
+    ready.wait()
+    measurements = [results.get() for _ in workers]
+    done.wait()
+    for worker in workers:
+        worker.join()
+    return {
+        "mode": mode,
+        "processes": processes,
+        "games": games,
+        "rss_mb_per_process": round(sum(m["rss_mb"] for m in measurements) / processes, 1),
+        "pss_mb_per_process": round(sum(m["pss_mb"] for m in measurements) / processes, 1),
+        "pss_mb_total": round(sum(m["pss_mb"] for m in measurements), 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory of processes holding private match frames against one mapped Arrow file")
+    parser.add_argument("--games", type=int, default=1000000)
+    parser.add_argument("--players", type=int, default=40)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        df = utils.normalize_match_data(generate_workbook(args.games, args.players)["Form Responses 1"])
+        DatasetStore(directory).publish("matches", df)
+        print(json.dumps({"frame_mb": round(df.memory_usage(deep=True).sum() / 2**20, 1)}))
+        del df
+
+        for processes in args.processes:
+            for mode in ["loaded", "copied", "shared"]:
+                print(json.dumps(run(mode, processes, args.games, args.players, directory)))
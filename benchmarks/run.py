@@ -0,0 +1,135 @@
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+import pandas as pd
+import utils
+from engine.player_games import build_player_games, PLAYER_COLUMNS
+from engine.leaderboard import compute_leaderboard
+from engine.match_index import MatchIndex
+from engine.heatmap import build_calendar_heatmap
+from engine import head_to_head
+from engine.attendance import Attendance
+from engine.cube import AggregateCube
+from engine.ratings import EloRatings
+from engine.rolling import RollingStats
+from engine.synergy import PartnerSynergy
+from engine.expenses import get_balances, explode_shuttle_expenses, get_player_shares
+from sections import leaderboard, datewise_stats, venue_section, individual_stats, synergy_section
+from benchmarks.synthetic import generate_workbook
+
+# Streamlit calls made outside `streamlit run` render nothing, so the display_*
+# sections below time the pandas, Plotly and AgGrid work without a browser
+
+
+def measure(results, name, fn, repeat, **params):
+    # best of `repeat` runs, the last result is handed back for the next stage
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        timings.append(time.perf_counter() - start)
+
+    results.append({"name": name, **params, "seconds": round(min(timings), 6), "repeat": repeat})
+    print(f"{name:<32} {json.dumps(params):<36} {min(timings):>10.4f}s", file=sys.stderr)
+    return value
+
+
+def run_scale(games, players, repeat, sections=True):
+    results = []
+    params = {"games": games, "players": players}
+    workbook = generate_workbook(games, players)
+
+    df = measure(results, "get_data", lambda: utils.normalize_match_data(workbook["Form Responses 1"]), repeat, **params)
+    player_games = measure(results, "build_player_games", lambda: build_player_games(df), repeat, **params)
+    all_players = list(np.unique(df[PLAYER_COLUMNS].values))
+    busiest_player = player_games["player"].value_counts().index[0]
+
+    rolling = measure(results, "build_rolling_stats", lambda: RollingStats(player_games), repeat, **params)
+    measure(results, "compute_leaderboard", lambda: compute_leaderboard(player_games, all_players, rolling), repeat, **params)
+    match_index = measure(results, "build_match_index", lambda: MatchIndex(df, player_games), repeat, **params)
+    measure(results, "build_matchups", lambda: head_to_head.build_matchups(df), repeat, **params)
+    measure(results, "get_player_stats", lambda: utils.get_player_stats(busiest_player, df, player_games), repeat, **params)
+    player_matches = measure(
+        results, "get_player_stats_indexed",
+        lambda: utils.get_player_stats(busiest_player, df, player_games, match_index.find(busiest_player)), repeat, **params
+    )
+    synergy = measure(results, "build_partner_synergy", lambda: PartnerSynergy(player_games), repeat, **params)
+    measure(results, "player_partner_stats", lambda: utils.get_player_stats(busiest_player, df, player_games).groupby("partner", observed=True).agg(total_games=("result", "count"), wins=("is_win", "sum"), average_ppg=("player_team_points", "mean")), repeat, **params)
+    player_partner_stats = measure(results, "player_partner_stats_synergy", lambda: synergy.partner_stats(busiest_player), repeat, **params)
+    win_rates = measure(results, "rolling_stats_rows", lambda: rolling.rows(match_index.find(busiest_player)), repeat, **params)
+
+    games_per_date = df.groupby("date").size()
+    measure(results, "build_calendar_heatmap", lambda: build_calendar_heatmap(games_per_date.index, games_per_date.to_numpy()), repeat, **params)
+    measure(results, "create_calendar_heatmap_figure", lambda: utils.create_calendar_heatmap_figure(games_per_date.index, games_per_date.to_numpy()), repeat, **params)
+
+    attendance = measure(results, "build_attendance", lambda: Attendance(df), repeat, **params)
+    measure(results, "players_on_date", attendance.players_on_date, repeat, **params)
+    expenses_df = workbook["expense_tracker"].sort_values("date")
+    settlements_df = workbook["settlements"].groupby(["paid_by", "paid_to"]).sum("amount").reset_index()
+    shuttle_expenses = explode_shuttle_expenses(workbook["shuttle_expense_tracker"])
+    player_share_df = measure(results, "get_player_shares", lambda: get_player_shares(attendance, expenses_df), repeat, **params)
+    measure(results, "get_balances", lambda: get_balances(player_share_df, settlements_df, shuttle_expenses), repeat, **params)
+
+    # the cube is rebuilt for the last 1% of games against folding just those in
+    cube = measure(results, "build_aggregate_cube", lambda: AggregateCube.build(df), repeat, **params)
+    previous_cube = AggregateCube.build(df.iloc[:games * 99 // 100])
+    measure(results, "update_aggregate_cube", lambda: previous_cube.update(df), repeat, **params)
+    player_cube = cube.player_view(busiest_player)
+
+    ratings = measure(results, "build_ratings", lambda: EloRatings.build(df), repeat, **params)
+    previous_ratings = EloRatings.build(df.iloc[:games * 99 // 100])
+    measure(results, "update_ratings", lambda: previous_ratings.update(df), repeat, **params)
+    measure(results, "rating_history_of", lambda: ratings.history_of(busiest_player), repeat, **params)
+
+    if sections:
+        measure(results, "display_leaderboard", lambda: leaderboard.display_leaderboard(player_games, all_players, ratings, rolling), repeat, **params)
+        measure(results, "display_synergy_heatmap", lambda: synergy_section.display_synergy_heatmap(synergy, all_players), repeat, **params)
+        measure(results, "display_date_section", lambda: datewise_stats.display_date_section(cube), repeat, **params)
+        measure(results, "display_venue_stats", lambda: venue_section.display_venue_stats(cube), repeat, **params)
+        measure(results, "display_player_win_loss_stats", lambda: individual_stats.display_player_win_loss_stats(player_cube), repeat, **params)
+        measure(results, "display_player_partner_stats", lambda: individual_stats.display_player_partner_stats(player_partner_stats, busiest_player), repeat, **params)
+        measure(results, "display_player_daily_stats", lambda: individual_stats.display_player_daily_stats(player_cube, busiest_player, win_rates), repeat, **params)
+
+    return results
+
+
+def environment():
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        revision = None
+    return {
+        "revision": revision,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time every data stage and section on synthetic data, results as JSON")
+    parser.add_argument("--games", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--players", type=int, nargs="+", default=[40])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-sections", action="store_true", help="skip the display_* sections")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    results = []
+    for games in args.games:
+        for players in args.players:
+            results += run_scale(games, players, args.repeat, sections=not args.no_sections)
+
+    report = json.dumps({"environment": environment(), "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+MATCH_SHEET_COLUMNS = [
+    "Timestamp", "Date", "Team 1 Player 1", "Team 1 Player 2", "Team 2 Player 1", "Team 2 Player 2",
+    "Points Team 1", "Points Team 2", "result", "Venue"
+]
+
+
+def generate_match_sheet(games, players, venues=8, games_per_day=12, seed=0):
+    # raw "Form Responses 1" rows, as get_all_records would return them
+    rng = np.random.default_rng(seed)
+    player_names = np.array([f"player_{i:04d}" for i in range(players)])
+    venue_names = np.array([f"venue {i}" for i in range(venues)])
+
+    lineups = _distinct_lineups(rng, games, players)
+
+    deuce = rng.random(games) < 0.15
+    loser_points = np.where(deuce, rng.integers(20, 29, games), rng.integers(5, 20, games))
+    winner_points = np.where(deuce, loser_points + 2, 21)
+    team_1_won = rng.random(games) < 0.5
+
+    timestamps = pd.Timestamp("2022-12-27 19:00") + pd.to_timedelta(np.arange(games) // games_per_day, unit="D") + pd.to_timedelta(np.arange(games) % games_per_day * 5, unit="min")
+
+    return pd.DataFrame({
+        "Timestamp": timestamps.strftime("%m/%d/%Y %H:%M:%S"),
+        "Date": timestamps.strftime("%m/%d/%Y"),
+        "Team 1 Player 1": player_names[lineups[:, 0]],
+        "Team 1 Player 2": player_names[lineups[:, 1]],
+        "Team 2 Player 1": player_names[lineups[:, 2]],
+        "Team 2 Player 2": player_names[lineups[:, 3]],
+        "Points Team 1": np.where(team_1_won, winner_points, loser_points),
+        "Points Team 2": np.where(team_1_won, loser_points, winner_points),
+        "result": "",
+        "Venue": venue_names[rng.integers(0, venues, games)],
+    }, columns=MATCH_SHEET_COLUMNS)
+
+
+def _distinct_lineups(rng, games, players):
+    lineups = rng.integers(0, players, (games, 4))
+    while True:
+        lineups.sort(axis=1)
+        clashes = (np.diff(lineups, axis=1) == 0).any(axis=1)
+        if not clashes.any():
+            return rng.permuted(lineups, axis=1)
+        lineups[clashes] = rng.integers(0, players, (clashes.sum(), 4))
+
+
+def generate_expense_sheets(match_sheet: pd.DataFrame, shuttle_every=10, settle_every=5, seed=0):
+    # expense_tracker, shuttle_expense_tracker and settlements rows for the sessions in `match_sheet`
+    rng = np.random.default_rng(seed)
+    sessions = match_sheet.drop_duplicates("Date")
+    dates = pd.to_datetime(sessions["Date"]).dt.strftime("%Y-%m-%d").to_numpy()
+    players = np.unique(match_sheet[["Team 1 Player 1", "Team 1 Player 2", "Team 2 Player 1", "Team 2 Player 2"]].to_numpy())
+
+    expenses = pd.DataFrame({
+        "date": dates,
+        "amount": rng.integers(5, 25, len(dates)) * 50,
+        # whoever played the first game of the day books the court
+        "paid_by": sessions["Team 1 Player 1"].to_numpy(),
+    })
+
+    shuttle_count = max(len(dates) // shuttle_every, 1)
+    shared_by = [", ".join(rng.choice(players, min(rng.integers(2, 9), len(players)), replace=False)) for _ in range(shuttle_count)]
+    shuttle_expenses = pd.DataFrame({
+        "expense_id": np.arange(1, shuttle_count + 1),
+        "record_date": np.sort(rng.choice(dates, shuttle_count)),
+        "paid_by": rng.choice(players, shuttle_count),
+        "amount": rng.integers(6, 31, shuttle_count) * 50,
+        "shared_by": shared_by,
+        "comments": "",
+    })
+
+    settle_count = max(len(dates) // settle_every, 1)
+    payers = rng.integers(0, len(players), settle_count)
+    payees = (payers + rng.integers(1, max(len(players), 2), settle_count)) % len(players)
+    settlements = pd.DataFrame({
+        "date": np.sort(rng.choice(dates, settle_count)),
+        "paid_by": players[payers],
+        "paid_to": players[payees],
+        "amount": (rng.integers(1, 40, settle_count) * 25).astype(float),
+    })
+
+    return {"expense_tracker": expenses, "shuttle_expense_tracker": shuttle_expenses, "settlements": settlements}
+
+
+def generate_workbook(games, players, venues=8, games_per_day=12, seed=0):
+    # every worksheet the app reads, keyed by worksheet name
+    match_sheet = generate_match_sheet(games, players, venues, games_per_day, seed)
+    return {"Form Responses 1": match_sheet, **generate_expense_sheets(match_sheet, seed=seed)}
@@ -0,0 +1,243 @@
+import threading
+import time
+
+MISSING = object()
+
+
+class _Flight:
+
+    def __init__(self, generation):
+        self.event = threading.Event()
+        self.generation = generation
+        self.value = MISSING
+        self.error = None
+        self.fingerprint = None
+        self.renewed = False
+        self.version = None
+
+
+class DataCache:
+    # Process-wide TTL cache shared by every Streamlit session. Concurrent misses
+    # on the same key are coalesced so only one caller runs the loader. With a
+    # `fingerprint(keys)` function an expired entry whose fingerprint hasn't moved
+    # is kept as it is (same version) instead of being loaded again. With
+    # `serve_stale` set, expired entries are handed out as they are and only
+    # refresh() (run by a background refresher) brings them up to date.
+
+    def __init__(self, ttl, fingerprint=None, serve_stale=False):
+        self.ttl = ttl
+        self.fingerprint = fingerprint
+        self.serve_stale = serve_stale
+        self.stats = {"loads": 0, "renewals": 0}
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._inflight = {}
+        self._generations = {}
+        self._versions = {}
+        self._latest_derived = {}
+
+    def _lookup(self, key, ttl):
+        # called with the lock held: (entry, None, False) when fresh, otherwise
+        # (None, flight, is_leader) for the load in progress or the one we start
+        entry = self._entries.get(key)
+        if entry is not None and (self.serve_stale or time.monotonic() - entry["loaded_at"] < ttl):
+            return entry, None, False
+
+        flight = self._inflight.get(key)
+        if flight is not None:
+            return None, flight, False
+
+        flight = self._inflight[key] = _Flight(self._generations.get(key, 0))
+        return None, flight, True
+
+    def _land(self, key, flight):
+        # called with the lock held once the leader is done with `flight`. If a write
+        # invalidated the key while we were loading, the value may predate it: hand it
+        # to the waiters but don't keep it (its version stays None)
+        if flight.error is None and flight.value is not MISSING and self._generations.get(key, 0) == flight.generation:
+            if flight.renewed:
+                self._entries[key].update(loaded_at=time.monotonic(), checked_at=time.time())
+                flight.version = self._entries[key]["version"]
+                self.stats["renewals"] += 1
+            else:
+                flight.version = self._versions[key] = self._versions.get(key, 0) + 1
+                self._entries[key] = {
+                    "value": flight.value,
+                    "version": flight.version,
+                    "loaded_at": time.monotonic(),
+                    "checked_at": time.time(),
+                    "fingerprint": flight.fingerprint
+                }
+                self.stats["loads"] += 1
+        del self._inflight[key]
+        flight.event.set()
+
+    def get(self, key, loader, ttl=None):
+        return self.get_versioned(key, loader, ttl)[0]
+
+    def get_versioned(self, key, loader, ttl=None):
+        # (value, version) read together, the version None when the value wasn't kept
+        ttl = self.ttl if ttl is None else ttl
+        while True:
+            with self._lock:
+                entry, flight, is_leader = self._lookup(key, ttl)
+            if flight is None:
+                return entry["value"], entry["version"]
+            if is_leader:
+                break
+
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            # MISSING means a batch leader could not load this key, load it ourselves
+            if flight.value is not MISSING:
+                return flight.value, flight.version
+
+        try:
+            self._revalidate({key: flight})
+            if not flight.renewed:
+                flight.value = loader()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._land(key, flight)
+
+        return flight.value, flight.version
+
+    def get_many(self, keys, batch_loader, ttl=None):
+        # `batch_loader(keys)` returns {key: value} for the keys it could load; the
+        # result only holds keys that were cached or loaded
+        ttl = self.ttl if ttl is None else ttl
+        results, waiting, leading = {}, {}, {}
+        with self._lock:
+            for key in keys:
+                entry, flight, is_leader = self._lookup(key, ttl)
+                if flight is None:
+                    results[key] = entry["value"]
+                elif is_leader:
+                    leading[key] = flight
+                else:
+                    waiting[key] = flight
+
+        if leading:
+            results.update(self._load_many(leading, batch_loader))
+
+        for key, flight in waiting.items():
+            flight.event.wait()
+            if flight.error is None and flight.value is not MISSING:
+                results[key] = flight.value
+
+        return results
+
+    def _load_many(self, leading, batch_loader):
+        # run the flights we lead through one batch load, {key: value} for those loaded
+        results = {}
+        try:
+            self._revalidate(leading)
+            missing_keys = [key for key, flight in leading.items() if not flight.renewed]
+            values = batch_loader(missing_keys) if missing_keys else {}
+            for key, flight in leading.items():
+                if not flight.renewed:
+                    flight.value = values.get(key, MISSING)
+                if flight.value is not MISSING:
+                    results[key] = flight.value
+        except Exception as e:
+            for flight in leading.values():
+                flight.error = e
+            raise
+        finally:
+            with self._lock:
+                for key, flight in leading.items():
+                    self._land(key, flight)
+        return results
+
+    def refresh(self, keys, batch_loader):
+        # revalidate `keys` now whatever their age, keys already being loaded are left
+        # to that load; readers keep getting the current values until this lands
+        with self._lock:
+            leading = {}
+            for key in keys:
+                if key not in self._inflight:
+                    leading[key] = self._inflight[key] = _Flight(self._generations.get(key, 0))
+        return self._load_many(leading, batch_loader) if leading else {}
+
+    def loading_fingerprints(self, keys):
+        # fingerprints taken for the loads of `keys` now in progress, for loaders that
+        # record what they loaded without asking the source again
+        with self._lock:
+            flights = {key: self._inflight.get(key) for key in keys}
+            return {key: flight.fingerprint for key, flight in flights.items() if flight is not None and flight.fingerprint is not None}
+
+    def checked_at(self, keys):
+        # wall clock time the oldest of the cached `keys` was last loaded or renewed
+        with self._lock:
+            times = [self._entries[key]["checked_at"] for key in keys if key in self._entries]
+        return min(times, default=None)
+
+    def _revalidate(self, flights):
+        # take the fingerprints of the keys about to be loaded, before loading them so a
+        # change made meanwhile shows up next time, and renew the entries that match
+        if self.fingerprint is None:
+            return
+        try:
+            fingerprints = self.fingerprint(list(flights))
+        except Exception:
+            # without a fingerprint the keys are simply loaded
+            return
+
+        with self._lock:
+            for key, flight in flights.items():
+                flight.fingerprint = fingerprints.get(key)
+                entry = self._entries.get(key)
+                if entry is not None and flight.fingerprint is not None and entry["fingerprint"] == flight.fingerprint:
+                    flight.value = entry["value"]
+                    flight.renewed = True
+
+    def get_derived(self, name, source_key, source_loader, builder, updater=None):
+        # `updater(previous_value, source)`, when given, refreshes the last derived value
+        # for a new source version instead of building it from scratch
+        source, version = self.get_versioned(source_key, source_loader)
+        return self._derive(name, version, source, builder, updater)
+
+    def derived_from(self, name, source_key, source, builder, updater=None):
+        # the derived value of this very `source` frame, for builders that need another
+        # derived value: fetching it anew could hand them one built from a newer version
+        with self._lock:
+            entry = self._entries.get(source_key)
+            version = entry["version"] if entry is not None and entry["value"] is source else None
+        return self._derive(name, version, source, builder, updater)
+
+    def _derive(self, name, version, source, builder, updater):
+        if version is None:
+            # the source isn't the cached one (any more), nothing to key the result on
+            return builder(source)
+
+        with self._lock:
+            stale_keys = [k for k in self._entries if isinstance(k, tuple) and k[0] == name and k[1] < version]
+            for k in stale_keys:
+                del self._entries[k]
+            previous = self._latest_derived.get(name)
+
+        def build():
+            value = builder(source) if updater is None or previous is None else updater(previous[1], source)
+            with self._lock:
+                latest = self._latest_derived.get(name)
+                if latest is None or latest[0] < version:
+                    self._latest_derived[name] = (version, value)
+            return value
+
+        # derived values live as long as the source version they were built from
+        return self.get((name, version), build, ttl=float("inf"))
+
+    def version(self, key):
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            keys = list(self._entries) if key is None else [key]
+            for k in keys:
+                self._entries.pop(k, None)
+                self._generations[k] = self._generations.get(k, 0) + 1
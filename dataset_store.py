@@ -0,0 +1,72 @@
+import glob
+import json
+import os
+import time
+import pyarrow as pa
+
+
+class DatasetStore:
+    # Normalized tables published as uncompressed Arrow IPC files that every session
+    # and every server process memory-maps read-only, so the pages of a table are
+    # held once by the OS page cache instead of once per process. Each table has a
+    # small pointer file naming its current version; a publish writes the new
+    # version first and swaps the pointer last.
+
+    def __init__(self, directory, keep_versions=2):
+        self.directory = directory
+        self.keep_versions = keep_versions
+
+    def _pointer_path(self, name):
+        return os.path.join(self.directory, f"{name}.json")
+
+    def _version_paths(self, name):
+        return sorted(glob.glob(os.path.join(self.directory, f"{name}-*.arrow")))
+
+    def publish(self, name, df, fingerprint=None):
+        # `fingerprint` is what the source looked like when `df` was read from it.
+        # False when the frame has no Arrow form (e.g. a column mixing ints and text)
+        try:
+            table = pa.Table.from_pandas(df)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            return False
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{name}-{time.time_ns()}.arrow")
+        with pa.OSFile(f"{path}.tmp", "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(f"{path}.tmp", path)
+
+        pointer = {"path": os.path.basename(path), "fingerprint": fingerprint, "published_at": time.time(), "rows": df.shape[0]}
+        tmp_pointer_path = f"{self._pointer_path(name)}.{os.getpid()}.tmp"
+        with open(tmp_pointer_path, "w") as f:
+            json.dump(pointer, f)
+        os.replace(tmp_pointer_path, self._pointer_path(name))
+
+        # older versions may still be mapped elsewhere, which POSIX allows; where the
+        # OS refuses to remove a mapped file it is left for the next publish
+        for old_path in self._version_paths(name)[:-self.keep_versions]:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+        return True
+
+    def fingerprint(self, name):
+        # of the current version, None if there is none
+        try:
+            with open(self._pointer_path(name)) as f:
+                return json.load(f)["fingerprint"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def read(self, name):
+        # the current version as a frame whose columns are read-only views of the mapped
+        # file where Arrow allows it (numbers, datetimes, categorical codes), None if absent
+        try:
+            with open(self._pointer_path(name)) as f:
+                path = os.path.join(self.directory, json.load(f)["path"])
+            table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        except (OSError, ValueError, KeyError):
+            return None
+        return table.to_pandas(split_blocks=True)
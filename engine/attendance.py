@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+from engine.player_games import PLAYER_COLUMNS
+
+
+def _player_codes(df: pd.DataFrame):
+    # codes of the four player columns stacked game by game per column, plus their names
+    columns = [df[col] for col in PLAYER_COLUMNS]
+    if all(isinstance(col.dtype, pd.CategoricalDtype) and col.dtype == columns[0].dtype for col in columns):
+        return np.concatenate([col.cat.codes.to_numpy() for col in columns]), columns[0].cat.categories.to_numpy()
+    return pd.factorize(np.concatenate([col.to_numpy(dtype=object) for col in columns]))
+
+
+class Attendance:
+    # Who played on which date: one (date, player) pair per player per session, built
+    # by stacking the four player columns and de-duplicating integer keys, with
+    # lookups both ways. 'other' stands for guests and is left out.
+
+    def __init__(self, df: pd.DataFrame, exclude=("other",)):
+        player_codes, player_names = _player_codes(df)
+        date_codes, dates = pd.factorize(df["date"].to_numpy(), sort=True)
+        date_codes = np.tile(date_codes, len(PLAYER_COLUMNS))
+
+        keep = (player_codes >= 0) & (date_codes >= 0)
+        keep[keep] = ~np.isin(player_names, exclude)[player_codes[keep]]
+        keys = np.unique(date_codes[keep].astype(np.int64) * len(player_names) + player_codes[keep])
+
+        # pairs are ordered by date, then by player code
+        self.dates = pd.DatetimeIndex(dates, name="date")
+        self.player_names = np.asarray(player_names, dtype=object)
+        self.date_codes = keys // len(player_names)
+        self.player_codes = keys % len(player_names)
+        self._date_bounds = np.searchsorted(self.date_codes, np.arange(len(self.dates) + 1))
+        self._player_order = np.argsort(self.player_codes, kind="stable")
+        self._player_bounds = np.searchsorted(self.player_codes[self._player_order], np.arange(len(self.player_names) + 1))
+
+    def players_on(self, date):
+        position = self.dates.get_indexer([pd.Timestamp(date)])[0]
+        if position < 0:
+            return []
+        start, end = self._date_bounds[position], self._date_bounds[position + 1]
+        return list(self.player_names[self.player_codes[start:end]])
+
+    def dates_of(self, player):
+        positions = np.flatnonzero(self.player_names == player)
+        if len(positions) == 0:
+            return self.dates[:0]
+        start, end = self._player_bounds[positions[0]], self._player_bounds[positions[0] + 1]
+        return self.dates[self.date_codes[self._player_order[start:end]]]
+
+    def players_per_date(self):
+        return np.diff(self._date_bounds)
+
+    def to_frame(self):
+        # the (date, player) pairs, dates as the "%Y-%m-%d" text the expense sheets use
+        date_labels = self.dates.strftime("%Y-%m-%d").to_numpy()
+        return pd.DataFrame({
+            "date": date_labels[self.date_codes],
+            "players": self.player_names[self.player_codes],
+            "number_of_players": self.players_per_date()[self.date_codes],
+        })
+
+    def players_on_date(self):
+        # one row per date holding the list of players who attended
+        players = self.player_names[self.player_codes]
+        return pd.DataFrame({
+            "players": [list(chunk) for chunk in np.split(players, self._date_bounds[1:-1])],
+            "number_of_players": self.players_per_date(),
+        }, index=pd.Index(self.dates.strftime("%Y-%m-%d"), name="date"))
@@ -0,0 +1,11 @@
+import hashlib
+import pandas as pd
+
+
+def prefix_digest(df: pd.DataFrame, columns, rows=None):
+    # digest of `columns` over the first `rows` rows (all of them by default). An
+    # incremental update compares it with the digest of the rows it consumed last
+    # time, so an edited, removed or reordered earlier row means a rebuild
+    rows = df.shape[0] if rows is None else rows
+    hashes = pd.util.hash_pandas_object(df[columns].iloc[:rows], index=False)
+    return hashlib.blake2b(hashes.to_numpy().tobytes(), digest_size=16).hexdigest()
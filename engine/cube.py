@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+from engine.player_games import build_player_games, PLAYER_COLUMNS
+from engine.coverage import prefix_digest
+
+GAME_KEYS = ["date", "venue", "point_bins"]
+PLAYER_KEYS = ["date", "venue", "player", "result", "point_bins"]
+CUBE_COLUMNS = ["date", "venue", "point_bins", "total_points_per_game", "margin", *PLAYER_COLUMNS, "points_team_1", "points_team_2", "winner"]
+MEASURES = {"games": "sum", "points": "sum", "margin_sum": "sum", "margin_max": "max", "margin_min": "min"}
+
+
+def _aggregate(keys: dict, points, margin):
+    # counts and sums of one batch of rows grouped by `keys`
+    partials = pd.DataFrame({**keys, "games": 1, "points": points, "margin_sum": margin, "margin_max": margin, "margin_min": margin})
+    return _combine(partials.set_index(list(keys)))
+
+
+def _merge(cube: pd.DataFrame, partials: pd.DataFrame):
+    # new games are from the latest dates, so only cube rows from their first date on can share a key
+    overlap = cube.index.get_level_values("date") >= partials.index.get_level_values("date").min()
+    return pd.concat([cube[~overlap], _combine(pd.concat([cube[overlap], partials]))])
+
+
+def _combine(partials: pd.DataFrame, levels=None):
+    levels = list(partials.index.names) if levels is None else levels
+    return partials.groupby(level=levels, observed=True, sort=True).agg(MEASURES)
+
+
+class AggregateCube:
+    # Counts and sums of the match data at two grains, games by (date, venue, point_bins)
+    # and player games by (date, venue, player, result, point_bins). The date, venue
+    # and player views are roll-ups of these, and new games are folded in without
+    # rescanning the old ones.
+
+    def __init__(self, games: pd.DataFrame, players: pd.DataFrame, rows=0, digest=None):
+        self.games = games
+        self.players = players
+        self.rows = rows
+        self.digest = digest
+
+    @classmethod
+    def build(cls, df: pd.DataFrame):
+        games, players = cls._partials(df)
+        return cls(games, players, df.shape[0], prefix_digest(df, CUBE_COLUMNS))
+
+    @staticmethod
+    def _partials(df: pd.DataFrame):
+        # point_bins and result stay categorical so roll-ups keep their natural order
+        games = _aggregate(
+            {"date": df["date"].to_numpy(), "venue": df["venue"].to_numpy(), "point_bins": df["point_bins"].array},
+            df["total_points_per_game"].to_numpy(),
+            df["margin"].to_numpy(),
+        )
+
+        player_games = build_player_games(df)
+        game = player_games["game"].to_numpy()
+        players = _aggregate(
+            {
+                "date": player_games["date"].to_numpy(),
+                "venue": player_games["venue"].to_numpy(),
+                "player": player_games["player"].to_numpy(),
+                "result": player_games["result"].array,
+                "point_bins": df["point_bins"].array[game],
+            },
+            player_games["points_for"].to_numpy(),
+            player_games["margin"].to_numpy(),
+        )
+        return games, players
+
+    def update(self, df: pd.DataFrame):
+        # fold in only the rows appended since the cube was built, rebuild if any row
+        # already counted was changed, removed or reordered
+        if df.shape[0] < self.rows or prefix_digest(df, CUBE_COLUMNS, self.rows) != self.digest:
+            return AggregateCube.build(df)
+        if df.shape[0] == self.rows:
+            return self
+
+        games, players = self._partials(df.iloc[self.rows:])
+        return AggregateCube(
+            _merge(self.games, games),
+            _merge(self.players, players),
+            df.shape[0],
+            prefix_digest(df, CUBE_COLUMNS),
+        )
+
+    def player_view(self, player, venue=None, start_date=None, end_date=None):
+        # the player's slice of the cube, optionally narrowed to a venue and date range
+        view = self.players.xs(player, level="player")
+        dates = view.index.get_level_values("date")
+        keep = np.ones(view.shape[0], dtype=bool)
+        if venue is not None:
+            keep &= view.index.get_level_values("venue") == venue
+        if start_date is not None:
+            keep &= dates >= pd.Timestamp(start_date)
+        if end_date is not None:
+            keep &= dates <= pd.Timestamp(end_date)
+        return view[keep]
+
+
+def roll_up(cube: pd.DataFrame, by):
+    # re-aggregate a cube slice to the `by` levels with games, average points and margins
+    rolled = _combine(cube, by)
+    return pd.DataFrame({
+        "total_games": rolled["games"],
+        "average_ppg": rolled["points"] / rolled["games"],
+        "mean_margin": rolled["margin_sum"] / rolled["games"],
+        "max_margin": rolled["margin_max"],
+        "min_margin": rolled["margin_min"],
+    })
@@ -0,0 +1,32 @@
+import pandas as pd
+import numpy as np
+from engine.attendance import Attendance
+from engine.ledger import net_positions, settlement_plan
+
+
+def get_balances(player_share_df: pd.DataFrame, settlements_df: pd.DataFrame, shuttle_expenses: pd.DataFrame):
+    # court shares and shuttle shares are owed to whoever paid, a settlement counts as
+    # the payer lending to the payee; everything is netted per player, then settled
+    positions = net_positions(
+        np.concatenate([player_share_df['players'], shuttle_expenses['covered_for'], settlements_df['paid_to']]),
+        np.concatenate([player_share_df['paid_by'], shuttle_expenses['paid_by'], settlements_df['paid_by']]),
+        np.concatenate([player_share_df['share'], shuttle_expenses['share'], settlements_df['amount']]),
+    )
+    return settlement_plan(positions)
+
+
+def explode_shuttle_expenses(shuttle_expenses: pd.DataFrame):
+    # one row per (shuttle expense, player it was covered for), the payer's own share left out
+    shuttle_expenses = shuttle_expenses.copy()
+    shuttle_expenses['covered_for'] = shuttle_expenses['shared_by'].str.split(', ')
+    shuttle_expenses['share'] = shuttle_expenses['amount'] / shuttle_expenses['covered_for'].apply(len)
+
+    shuttle_expenses = shuttle_expenses.explode('covered_for')[['expense_id', 'record_date', 'paid_by', 'amount', 'share', 'covered_for', 'comments']]
+    return shuttle_expenses[shuttle_expenses['paid_by'] != shuttle_expenses['covered_for']]
+
+
+def get_player_shares(attendance: Attendance, expenses_df: pd.DataFrame):
+    # each day's court expense split between the players who attended that day
+    player_share_df = pd.merge(attendance.to_frame(), expenses_df, how="inner", on="date")
+    player_share_df['share'] = player_share_df['amount'] / player_share_df['number_of_players']
+    return player_share_df
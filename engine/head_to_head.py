@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+from engine.coverage import prefix_digest
+
+MATCHUP_KEYS = ["pair_a", "pair_b"]
+MATCH_COLUMNS = ["team_1_player_1", "team_1_player_2", "team_2_player_1", "team_2_player_2", "points_team_1", "points_team_2", "winner", "margin", "total_points_per_game"]
+SUM_COLUMNS = ["games", "a_wins", "b_wins", "a_points", "b_points", "a_win_margin", "b_win_margin", "deuce_games", "a_deuce_wins", "b_deuce_wins"]
+MIN_COLUMNS = ["a_min_points", "b_min_points"]
+BEST_COLUMNS = [("a_largest_win_margin", "a_largest_win_game"), ("b_largest_win_margin", "b_largest_win_game"), ("longest_game_points", "longest_game")]
+
+
+def pair_key(first, second):
+    # unordered pair of players as a single sortable key
+    return np.where(first <= second, first + " & " + second, second + " & " + first)
+
+
+def _game_partials(df: pd.DataFrame, first_game=0):
+    # every game as a one-game matchup, oriented so that pair_a < pair_b
+    team_1_pair = pair_key(df["team_1_player_1"].to_numpy(), df["team_1_player_2"].to_numpy())
+    team_2_pair = pair_key(df["team_2_player_1"].to_numpy(), df["team_2_player_2"].to_numpy())
+    a_is_team_1 = team_1_pair <= team_2_pair
+
+    points_team_1, points_team_2 = df["points_team_1"].to_numpy(), df["points_team_2"].to_numpy()
+    a_points = np.where(a_is_team_1, points_team_1, points_team_2)
+    b_points = np.where(a_is_team_1, points_team_2, points_team_1)
+    a_won = (df["winner"].to_numpy() == "team_1") == a_is_team_1
+    margin = df["margin"].to_numpy()
+    total_points = df["total_points_per_game"].to_numpy()
+    deuce = total_points > 40
+    game = np.arange(first_game, first_game + df.shape[0])
+
+    return pd.DataFrame({
+        "pair_a": np.where(a_is_team_1, team_1_pair, team_2_pair),
+        "pair_b": np.where(a_is_team_1, team_2_pair, team_1_pair),
+        "games": 1,
+        "a_wins": a_won.astype(int),
+        "b_wins": (~a_won).astype(int),
+        "a_points": a_points,
+        "b_points": b_points,
+        "a_win_margin": np.where(a_won, margin, 0),
+        "b_win_margin": np.where(a_won, 0, margin),
+        "deuce_games": deuce.astype(int),
+        "a_deuce_wins": (deuce & a_won).astype(int),
+        "b_deuce_wins": (deuce & ~a_won).astype(int),
+        "a_min_points": a_points,
+        "b_min_points": b_points,
+        "recent_game": game,
+        "a_largest_win_margin": np.where(a_won, margin, -1),
+        "a_largest_win_game": np.where(a_won, game, -1),
+        "b_largest_win_margin": np.where(a_won, -1, margin),
+        "b_largest_win_game": np.where(a_won, -1, game),
+        "longest_game_points": total_points,
+        "longest_game": game,
+    }).set_index(MATCHUP_KEYS)
+
+
+def _combine(partials: pd.DataFrame):
+    grouped = partials.groupby(level=MATCHUP_KEYS, sort=False)
+    matchups = pd.concat([
+        grouped[SUM_COLUMNS].sum(),
+        grouped[MIN_COLUMNS].min(),
+        grouped["recent_game"].max(),
+    ], axis=1)
+
+    # keep the game behind each maximum, the earliest one on ties
+    for value, game in BEST_COLUMNS:
+        best = partials[[value, game]].sort_values([value, game], ascending=[False, True]).groupby(level=MATCHUP_KEYS, sort=False).head(1)
+        matchups = matchups.join(best)
+
+    return matchups.sort_values("games", ascending=False, kind="stable")
+
+
+def _with_coverage(matchups: pd.DataFrame, df: pd.DataFrame):
+    matchups.attrs["rows"] = df.shape[0]
+    matchups.attrs["digest"] = prefix_digest(df, MATCH_COLUMNS)
+    return matchups
+
+
+def build_matchups(df: pd.DataFrame):
+    return _with_coverage(_combine(_game_partials(df)), df)
+
+
+def update_matchups(matchups: pd.DataFrame, df: pd.DataFrame):
+    # fold in only the rows appended since the table was built, rebuild if any row
+    # already folded in was changed, removed or reordered
+    synced_rows = matchups.attrs.get("rows", 0)
+    if df.shape[0] < synced_rows or prefix_digest(df, MATCH_COLUMNS, synced_rows) != matchups.attrs.get("digest"):
+        return build_matchups(df)
+    if df.shape[0] == synced_rows:
+        return matchups
+
+    return _with_coverage(_combine(pd.concat([matchups, _game_partials(df.iloc[synced_rows:], synced_rows)])), df)
+
+
+def get_matchup(matchups: pd.DataFrame, team_1, team_2):
+    # stats of team_1 vs team_2 with team_1 on the "team_1_*" side, None if they never played
+    team_1_pair, team_2_pair = " & ".join(sorted(team_1)), " & ".join(sorted(team_2))
+    team_1_side, team_2_side = ("a_", "b_") if team_1_pair <= team_2_pair else ("b_", "a_")
+    key = (team_1_pair, team_2_pair) if team_1_side == "a_" else (team_2_pair, team_1_pair)
+
+    if key not in matchups.index:
+        return None
+
+    matchup = matchups.loc[key]
+    return {
+        **{column: matchup[column] for column in matchup.index if column[:2] not in ["a_", "b_"]},
+        **{f"team_1_{column[2:]}": matchup[column] for column in matchup.index if column.startswith(team_1_side)},
+        **{f"team_2_{column[2:]}": matchup[column] for column in matchup.index if column.startswith(team_2_side)},
+    }
+
+
+def rank_rivalries(matchups: pd.DataFrame, min_games=5):
+    rivalries = matchups[matchups["games"] >= min_games]
+    rivalries = pd.DataFrame({
+        "games": rivalries["games"],
+        "wins": rivalries["a_wins"].astype(str) + " - " + rivalries["b_wins"].astype(str),
+        "average_ppg": ((rivalries["a_points"] + rivalries["b_points"]) / rivalries["games"]).round(2),
+        "deuce_games": rivalries["deuce_games"],
+        "balance": (1 - (rivalries["a_wins"] - rivalries["b_wins"]).abs() / rivalries["games"]).round(2),
+    })
+    return rivalries.sort_values(["games", "balance"], ascending=False).reset_index()
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+DAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+
+def build_calendar_heatmap(dates, counts, start_date=None, end_date=None, label="games"):
+    # 7 x weeks grid (rows Mon..Sun, columns weeks starting on Monday) of counts per day
+    dates = pd.to_datetime(pd.Series(dates)).to_numpy().astype("datetime64[D]")
+    counts = np.asarray(counts, dtype=float)
+
+    start = np.datetime64(pd.Timestamp(start_date).date(), "D") if start_date is not None else dates.min()
+    end = np.datetime64(pd.Timestamp(end_date).date(), "D") if end_date is not None else dates.max()
+
+    # 1970-01-01 was a Thursday
+    first_monday = start - (start.astype(np.int64) + 3) % 7
+    weeks = (end - first_monday).astype(np.int64) // 7 + 1
+
+    in_range = (dates >= start) & (dates <= end)
+    day_offsets = (dates[in_range] - first_monday).astype(np.int64)
+    z = np.bincount(day_offsets, weights=counts[in_range], minlength=weeks * 7).reshape(weeks, 7).T
+
+    cell_dates = (first_monday + np.arange(weeks * 7)).reshape(weeks, 7).T
+    outside = (cell_dates < start) | (cell_dates > end)
+    z[outside] = np.nan
+
+    hover_text = (
+        pd.Series(np.nan_to_num(z.ravel()).astype(int)).astype(str)
+        + f" {label} played on "
+        + pd.DatetimeIndex(cell_dates.ravel()).strftime("%a, %Y-%m-%d")
+    ).to_numpy().reshape(z.shape)
+    hover_text[outside] = ""
+
+    return {
+        "z": z,
+        "hovertext": hover_text,
+        "x": cell_dates[0],
+        "y": DAY_NAMES,
+    }
@@ -0,0 +1,22 @@
+import pandas as pd
+from engine.rolling import RollingStats
+
+
+def compute_leaderboard(player_games: pd.DataFrame, players_list, rolling: RollingStats = None, form_games=5):
+    rolling = RollingStats(player_games, form_games=form_games) if rolling is None else rolling
+    player_games = player_games[player_games["player"].isin(players_list)]
+    by_player = player_games.groupby("player", sort=False, observed=True)
+
+    # is_win is int8 and a grouped sum keeps that dtype whenever the totals fit, which
+    # `wins * 100` then overflows
+    leaderboard = by_player.agg(**{
+        "total_games": pd.NamedAgg("is_win", "size"),
+        "wins": pd.NamedAgg("is_win", "sum"),
+    }).astype("int64").reindex(pd.Index(players_list, name="player"))
+
+    leaderboard["wins_pct"] = (leaderboard["wins"] * 100 / leaderboard["total_games"]).round(2)
+
+    # most recent first, e.g. "W W L W L"
+    leaderboard = leaderboard.join(rolling.summary().set_index("player")[["form", "streak", "longest_win_streak"]])
+
+    return leaderboard.reset_index()
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+
+def net_positions(debtors, creditors, amounts):
+    # what each player is owed (positive) or owes (negative) once every debt is netted,
+    # given parallel arrays of "debtor owes creditor amount" entries
+    codes, players = pd.factorize(np.concatenate([np.asarray(debtors, dtype=object), np.asarray(creditors, dtype=object)]))
+    amounts = np.asarray(amounts, dtype=float)
+    debtor_codes, creditor_codes = codes[:len(amounts)], codes[len(amounts):]
+
+    positions = np.bincount(creditor_codes, weights=amounts, minlength=len(players)) - np.bincount(debtor_codes, weights=amounts, minlength=len(players))
+    return pd.Series(positions, index=pd.Index(players, name="player"), name="position")
+
+
+def settlement_plan(positions: pd.Series, tolerance=0.005):
+    # transfers that clear every position: the largest debtor pays the largest creditor
+    # until one of them is square, which needs at most one transfer fewer than players
+    positions = positions.round(2)
+    debtors = positions[positions < -tolerance].sort_values()
+    creditors = positions[positions > tolerance].sort_values(ascending=False)
+    debts, credits = -debtors.to_numpy(), creditors.to_numpy()
+
+    plan = []
+    i = j = 0
+    while i < len(debts) and j < len(credits):
+        amount = min(debts[i], credits[j])
+        plan.append((debtors.index[i], creditors.index[j], round(amount, 2)))
+        debts[i] -= amount
+        credits[j] -= amount
+        if debts[i] <= tolerance:
+            i += 1
+        if credits[j] <= tolerance:
+            j += 1
+
+    return pd.DataFrame(plan, columns=["player", "owes_to", "amount"])
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+
+def _group_positions(keys):
+    # {key: sorted positions of that key}, keys given as a categorical or factorizable array
+    codes, uniques = pd.factorize(keys)
+    order = np.argsort(codes, kind="stable")
+    boundaries = np.flatnonzero(np.diff(codes[order])) + 1
+    groups = np.split(order.astype(np.int32), boundaries)
+    return {uniques[codes[group[0]]]: group for group in groups if len(group) and codes[group[0]] >= 0}
+
+
+class MatchIndex:
+    # Sorted row-id lists per player and venue, so composite filters are answered by
+    # intersecting a few short arrays instead of scanning the match frame.
+
+    def __init__(self, df: pd.DataFrame, player_games: pd.DataFrame):
+        self.player_games = player_games
+        self._game_dates = df["date"].to_numpy()
+        self._venue_games = _group_positions(df["venue"].to_numpy())
+
+        # player_games is ordered by game, so each player's rows are ordered by game too
+        self._player_rows = _group_positions(player_games["player"].to_numpy())
+        games = player_games["game"].to_numpy()
+        teams = player_games["team"].cat.codes.to_numpy()
+        self._player_games = {player: games[rows] for player, rows in self._player_rows.items()}
+        self._player_teams = {player: teams[rows] for player, rows in self._player_rows.items()}
+
+    def player_rows(self, player):
+        return self._player_rows.get(player, np.empty(0, dtype=np.int32))
+
+    def venue_games(self, venue):
+        return self._venue_games.get(venue, np.empty(0, dtype=np.int32))
+
+    def find(self, player, partner=None, opponents=(), venue=None, start_date=None, end_date=None):
+        # player_games row ids of `player` for the games matching every given filter
+        rows = self.player_rows(player)
+        games = self._player_games.get(player, rows)
+        teams = self._player_teams.get(player, rows)
+
+        for other, same_team in [(partner, True)] + [(opponent, False) for opponent in opponents]:
+            if other is None:
+                continue
+            if other not in self._player_games:
+                return rows[:0]
+            _, own_ind, other_ind = np.intersect1d(games, self._player_games[other], assume_unique=True, return_indices=True)
+            keep = own_ind[(teams[own_ind] == self._player_teams[other][other_ind]) == same_team]
+            rows, games, teams = rows[keep], games[keep], teams[keep]
+
+        if venue is not None:
+            keep = np.isin(games, self.venue_games(venue), assume_unique=True)
+            rows, games = rows[keep], games[keep]
+
+        if start_date is not None or end_date is not None:
+            dates = self._game_dates[games]
+            keep = np.ones(len(games), dtype=bool)
+            if start_date is not None:
+                keep &= dates >= np.datetime64(pd.Timestamp(start_date))
+            if end_date is not None:
+                keep &= dates <= np.datetime64(pd.Timestamp(end_date))
+            rows = rows[keep]
+
+        return rows
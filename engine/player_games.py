@@ -0,0 +1,41 @@
+import pandas as pd
+import numpy as np
+
+PLAYER_COLUMNS = ["team_1_player_1", "team_1_player_2", "team_2_player_1", "team_2_player_2"]
+
+
+def build_player_games(df: pd.DataFrame):
+    # one row per (game, player), `game` being the row position in df
+    games = df.shape[0]
+    players = [df[col].to_numpy() for col in PLAYER_COLUMNS]
+    points_team_1, points_team_2 = df["points_team_1"].to_numpy(), df["points_team_2"].to_numpy()
+    player_categories = np.unique(np.concatenate(players).astype(str))
+
+    player_games = pd.DataFrame({
+        "game": np.tile(np.arange(games, dtype=np.int32), 4),
+        "player": np.concatenate(players),
+        "team": np.repeat(["team_1", "team_1", "team_2", "team_2"], games),
+        "partner": np.concatenate([players[1], players[0], players[3], players[2]]),
+        "opponent_1": np.concatenate([players[2], players[2], players[0], players[0]]),
+        "opponent_2": np.concatenate([players[3], players[3], players[1], players[1]]),
+        "points_for": np.concatenate([points_team_1, points_team_1, points_team_2, points_team_2]),
+        "points_against": np.concatenate([points_team_2, points_team_2, points_team_1, points_team_1]),
+    })
+
+    # a name listed twice in one game (e.g. 'other') counts once, on the first team it appears in
+    player_games = player_games.drop_duplicates(["game", "player"]).sort_values("game", kind="stable").reset_index(drop=True)
+    game = player_games["game"].to_numpy()
+
+    player_games["is_win"] = (player_games["team"].to_numpy() == df["winner"].to_numpy()[game]).astype(np.int8)
+    player_games["result"] = pd.Categorical.from_codes(player_games["is_win"], categories=["loss", "win"])
+    player_games["margin"] = df["margin"].to_numpy()[game]
+    player_games["date"] = df["date"].to_numpy()[game]
+    player_games["venue"] = pd.Categorical(df["venue"].to_numpy()[game])
+
+    return player_games.astype({
+        **{col: pd.CategoricalDtype(player_categories) for col in ["player", "partner", "opponent_1", "opponent_2"]},
+        "team": "category",
+        "points_for": np.int16,
+        "points_against": np.int16,
+        "margin": np.int16,
+    })
@@ -0,0 +1,130 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from engine.player_games import PLAYER_COLUMNS
+from engine.coverage import prefix_digest
+
+RATED_COLUMNS = ["timestamp", *PLAYER_COLUMNS, "winner"]
+
+
+class EloRatings:
+    # Doubles Elo over the match stream in timestamp order. A team plays at the mean
+    # rating of its pair and both partners move by the same amount, so each game is a
+    # constant amount of work. The rating of every player after every game is kept
+    # (one row per game, in PLAYER_COLUMNS order, next to the players' positions in
+    # `names`) for the history charts. Players in `fixed` (guests) always play at
+    # the initial rating.
+
+    def __init__(self, k=24, initial=1500, scale=400, fixed=("other",)):
+        self.k = k
+        self.initial = initial
+        self.scale = scale
+        self.fixed = tuple(fixed)
+        self.names = []
+        self.ratings = []
+        self.games = []
+        self.rows = 0
+        self.digest = None
+        self.codes = np.empty((0, 4), dtype=np.int32)
+        self.history = np.empty((0, 4), dtype=np.float32)
+        self.timestamps = np.empty(0, dtype="datetime64[ns]")
+
+    def _copy(self):
+        copy = EloRatings(self.k, self.initial, self.scale, self.fixed)
+        copy.names, copy.ratings, copy.games = list(self.names), list(self.ratings), list(self.games)
+        copy.rows, copy.digest = self.rows, self.digest
+        copy.codes, copy.history, copy.timestamps = self.codes, self.history, self.timestamps
+        return copy
+
+    def _codes(self, df: pd.DataFrame):
+        # (games, 4) player positions in self.names, adding the names not seen yet
+        names = np.concatenate([df[col].to_numpy(dtype=object) for col in PLAYER_COLUMNS])
+        known = set(self.names)
+        new_names = [name for name in pd.unique(names) if name not in known]
+        self.names += new_names
+        self.ratings += [float(self.initial)] * len(new_names)
+        self.games += [0] * len(new_names)
+        return pd.Index(self.names).get_indexer(names).reshape(4, -1).T
+
+    def _replay(self, df: pd.DataFrame):
+        codes = self._codes(df)
+        team_1_won = (df["winner"].to_numpy() == "team_1").tolist()
+        fixed = [position for position, name in enumerate(self.names) if name in self.fixed]
+
+        ratings, k, scale, initial = self.ratings, self.k, self.scale, float(self.initial)
+        history = []
+        for (a1, a2, b1, b2), won in zip(codes.tolist(), team_1_won):
+            expected = 1 / (1 + 10 ** ((ratings[b1] + ratings[b2] - ratings[a1] - ratings[a2]) / (2 * scale)))
+            delta = k * ((1.0 if won else 0.0) - expected)
+            ratings[a1] += delta
+            ratings[a2] += delta
+            ratings[b1] -= delta
+            ratings[b2] -= delta
+            for position in fixed:
+                ratings[position] = initial
+            history.append((ratings[a1], ratings[a2], ratings[b1], ratings[b2]))
+
+        self.games = (np.asarray(self.games) + np.bincount(codes.ravel(), minlength=len(self.names))).tolist()
+        self.codes = np.concatenate([self.codes, codes.astype(np.int32)])
+        self.history = np.concatenate([self.history, np.asarray(history, dtype=np.float32).reshape(-1, 4)])
+        self.timestamps = np.concatenate([self.timestamps, df["timestamp"].to_numpy()])
+        self.rows += df.shape[0]
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, **params):
+        ratings = cls(**params)
+        ratings._replay(df)
+        ratings.digest = prefix_digest(df, RATED_COLUMNS)
+        return ratings
+
+    def update(self, df: pd.DataFrame):
+        # apply only the games appended since, replay everything if any game already
+        # rated was changed (a corrected score or player), removed or reordered
+        if df.shape[0] < self.rows or prefix_digest(df, RATED_COLUMNS, self.rows) != self.digest:
+            return EloRatings.build(df, k=self.k, initial=self.initial, scale=self.scale, fixed=self.fixed)
+        if df.shape[0] == self.rows:
+            return self
+
+        ratings = self._copy()
+        ratings._replay(df.iloc[self.rows:])
+        ratings.digest = prefix_digest(df, RATED_COLUMNS)
+        return ratings
+
+    def table(self):
+        # current rating and games played per player, highest first
+        return pd.DataFrame({
+            "player": self.names,
+            "rating": np.round(self.ratings, 1),
+            "rated_games": self.games,
+        }).sort_values("rating", ascending=False, ignore_index=True)
+
+    def history_of(self, player):
+        # the player's rating after each of their games
+        position = self.names.index(player) if player in self.names else -1
+        games, slots = np.nonzero(self.codes == position)
+        return pd.DataFrame({"timestamp": self.timestamps[games], "rating": self.history[games, slots]})
+
+    def save(self, path):
+        # checkpoint next to the match snapshot, written aside and swapped in
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        meta = {
+            "k": self.k, "initial": self.initial, "scale": self.scale, "fixed": list(self.fixed),
+            "names": self.names, "ratings": self.ratings, "games": self.games, "rows": self.rows, "digest": self.digest,
+        }
+        np.savez(tmp_path, codes=self.codes, history=self.history, timestamps=self.timestamps, meta=np.array(json.dumps(meta)))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        # None when there is no usable checkpoint (missing, unreadable or from before digests)
+        try:
+            with np.load(path, allow_pickle=False) as checkpoint:
+                meta = json.loads(str(checkpoint["meta"]))
+                ratings = cls(meta["k"], meta["initial"], meta["scale"], meta["fixed"])
+                ratings.codes, ratings.history, ratings.timestamps = checkpoint["codes"], checkpoint["history"], checkpoint["timestamps"]
+            ratings.names, ratings.ratings, ratings.games, ratings.rows = meta["names"], meta["ratings"], meta["games"], meta["rows"]
+            ratings.digest = meta["digest"]
+        except (OSError, ValueError, KeyError):
+            return None
+        return ratings
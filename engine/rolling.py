@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+
+class RollingStats:
+    # Form, streaks and running win rates for every player at once. player_games rows
+    # are stably sorted by player, which keeps each player's games in game order, and
+    # every statistic is a cumulative sum or a run length over that order, computed
+    # once per matches version. Per-row values line up with player_games.
+
+    def __init__(self, player_games: pd.DataFrame, window=20, form_games=5):
+        self.window = window
+        self.form_games = form_games
+        self.player_names = player_games["player"].cat.categories.to_numpy()
+        self.dates = player_games["date"].to_numpy()
+
+        codes = player_games["player"].cat.codes.to_numpy()
+        order = np.argsort(codes, kind="stable")
+        player = codes[order]
+        wins = player_games["is_win"].to_numpy()[order].astype(np.int64)
+        rows = len(order)
+
+        self._order = order
+        self._bounds = np.searchsorted(player, np.arange(len(self.player_names) + 1))
+        position = np.arange(rows) - self._bounds[player]
+
+        # wins so far and over the last `window` games, both within the player's own games
+        total_wins = np.cumsum(wins)
+        cumulative_wins = total_wins - (total_wins - wins)[self._bounds[player]]
+        window_start = np.where(position >= window, np.arange(rows) - window, -1)
+        window_wins = cumulative_wins - np.where(window_start >= 0, cumulative_wins[np.maximum(window_start, 0)], 0)
+
+        # runs of equal results, restarting at each player's first game
+        run_starts = np.ones(rows, dtype=bool)
+        run_starts[1:] = (wins[1:] != wins[:-1]) | (player[1:] != player[:-1])
+        run_start_rows = np.flatnonzero(run_starts)
+        run_length = np.arange(rows) - run_start_rows[np.cumsum(run_starts) - 1] + 1
+        run_lengths = np.diff(np.append(run_start_rows, rows))
+        run_players, run_wins = player[run_start_rows], wins[run_start_rows]
+
+        # runs are grouped by player too, so the longest is a max over each player's slice
+        run_bounds = np.searchsorted(run_players, np.arange(len(self.player_names)))
+        has_runs = np.diff(np.append(run_bounds, len(run_players))) > 0
+        self.longest_win_streak = np.zeros(len(self.player_names), dtype=np.int64)
+        self.longest_loss_streak = np.zeros(len(self.player_names), dtype=np.int64)
+        self.longest_win_streak[has_runs] = np.maximum.reduceat(run_lengths * run_wins, run_bounds[has_runs])
+        self.longest_loss_streak[has_runs] = np.maximum.reduceat(run_lengths * (1 - run_wins), run_bounds[has_runs])
+
+        self._wins = wins
+        self._cumulative_win_pct = self._scatter(cumulative_wins * 100 / (position + 1))
+        self._rolling_win_pct = self._scatter(window_wins * 100 / np.minimum(position + 1, window))
+        # positive while winning, negative while losing
+        self._streak = self._scatter(np.where(wins == 1, run_length, -run_length))
+
+    def _scatter(self, values):
+        # values in player order back to player_games order
+        out = np.empty_like(values)
+        out[self._order] = values
+        return out
+
+    def summary(self):
+        # one row per player who played: last `form_games` results (most recent
+        # first), the current streak, longest streaks and the recent win rate
+        last_rows = self._bounds[1:] - 1
+        played = np.diff(self._bounds) > 0
+        letters = np.where(self._wins == 1, "W", "L")
+        form = [
+            " ".join(letters[max(start, end - self.form_games):end][::-1])
+            for start, end in zip(self._bounds[:-1][played], self._bounds[1:][played])
+        ]
+        current = self._streak[self._order[last_rows[played]]]
+
+        return pd.DataFrame({
+            "player": self.player_names[played],
+            "form": form,
+            "streak": [f"{'W' if run > 0 else 'L'}{abs(run)}" for run in current],
+            "longest_win_streak": self.longest_win_streak[played],
+            "longest_loss_streak": self.longest_loss_streak[played],
+            f"last_{self.window}_win_pct": np.round(self._rolling_win_pct[self._order[last_rows[played]]], 2),
+        })
+
+    def rows(self, player_game_rows):
+        # running win rates and streak at the given player_games rows
+        return pd.DataFrame({
+            "date": self.dates[player_game_rows],
+            "cumulative_win_pct": np.round(self._cumulative_win_pct[player_game_rows], 2),
+            f"last_{self.window}_win_pct": np.round(self._rolling_win_pct[player_game_rows], 2),
+            "streak": self._streak[player_game_rows],
+        })
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+
+class PartnerSynergy:
+    # players x players partnership totals (games together, wins together, points
+    # scored together), scatter-added from player_games in one pass per matches
+    # version. Row i holds what player i did alongside each partner, so a player's
+    # partner table is a row slice and the group heatmap is the whole matrix.
+
+    def __init__(self, player_games: pd.DataFrame):
+        self.players = player_games["player"].cat.categories.to_numpy()
+        self._player_codes = player_games["player"].cat.codes.to_numpy()
+        self._partner_codes = player_games["partner"].cat.codes.to_numpy()
+        self._is_win = player_games["is_win"].to_numpy()
+        self._points = player_games["points_for"].to_numpy()
+
+        size = len(self.players)
+        cells = self._player_codes.astype(np.int64) * size + self._partner_codes
+        self.games = np.bincount(cells, minlength=size * size).reshape(size, size)
+        self.wins = np.bincount(cells, weights=self._is_win, minlength=size * size).reshape(size, size).astype(np.int64)
+        self.points = np.bincount(cells, weights=self._points, minlength=size * size).reshape(size, size).astype(np.int64)
+
+    def partner_stats(self, player, player_game_rows=None):
+        # the player's partner table; with `player_game_rows` (the player's filtered
+        # player_games rows) it is added up from just those rows instead
+        size = len(self.players)
+        position = np.searchsorted(self.players, player)
+        if position == size or self.players[position] != player:
+            games = wins = points = np.zeros(size, dtype=np.int64)
+        elif player_game_rows is None:
+            games, wins, points = self.games[position], self.wins[position], self.points[position]
+        else:
+            partners = self._partner_codes[player_game_rows]
+            games = np.bincount(partners, minlength=size)
+            wins = np.bincount(partners, weights=self._is_win[player_game_rows], minlength=size).astype(np.int64)
+            points = np.bincount(partners, weights=self._points[player_game_rows], minlength=size).astype(np.int64)
+
+        played = games > 0
+        partner_stats = pd.DataFrame({
+            "total_games": games[played],
+            "wins": wins[played],
+            "average_ppg": (points[played] / games[played]).round(2),
+        }, index=pd.Index(self.players[played], name="partner"))
+        partner_stats["win_pct"] = (partner_stats["wins"] * 100 / partner_stats["total_games"]).round(2)
+        return partner_stats
+
+    def win_pct_matrix(self, players, min_games=10):
+        # pair win percentages between `players`, NaN for pairs with fewer than `min_games`
+        positions = np.searchsorted(self.players, players)
+        games = self.games[np.ix_(positions, positions)]
+        wins = self.wins[np.ix_(positions, positions)]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            win_pct = np.where(games >= min_games, np.round(wins * 100 / games, 2), np.nan)
+        return pd.DataFrame(win_pct, index=pd.Index(players, name="player"), columns=pd.Index(players, name="partner"))
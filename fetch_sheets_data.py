@@ -1,31 +1,226 @@
 import gspread
+from gspread.auth import DEFAULT_SCOPES
+from gspread.exceptions import APIError, WorksheetNotFound
+from gspread.urls import DRIVE_FILES_API_V3_URL
+from gspread.utils import numericise_all, absolute_range_name, fill_gaps, rowcol_to_a1
+from google.oauth2.service_account import Credentials
+from contextlib import contextmanager
+import queue
+import random
+import re
+import threading
+import time
+from storage_backend import StorageBackend
+from rate_limiter import TokenBucket, current_priority
+from instrumentation import instrumented, timed
 import pandas as pd
 import numpy as np
 
-class Gsheet:
+def records_frame(values):
+    # same shape and numeric conversion as pd.DataFrame(worksheet.get_all_records())
+    if len(values) == 0:
+        return pd.DataFrame()
+    return pd.DataFrame([numericise_all(row) for row in values[1:]], columns=values[0])
 
-    def __init__(self, config_dict):
-        self.service_account = gspread.service_account_from_dict(config_dict)
 
-    def get_sheet_data(self, workbook_name, worksheet_name):
-        workbook = self.service_account.open(workbook_name)
-        worksheet = workbook.worksheet(worksheet_name)
-        return pd.DataFrame(worksheet.get_all_records())
-    
-    def add_expense(self, workbook_name, worksheet_name, expense_details):
-        workbook = self.service_account.open(workbook_name)
-        worksheet = None
-        try:
-            worksheet = workbook.worksheet(worksheet_name)
-        except:
-            worksheet = workbook.add_worksheet(worksheet_name, 1000, 20)
-        worksheet.append_row(expense_details)
-
-    def add_settlement(self, workbook_name, worksheet_name, expense_details):
-        workbook = self.service_account.open(workbook_name)
-        worksheet = None
+class QuotaAwareClient(gspread.Client):
+    # gspread client that takes a token from the shared bucket before every request
+    # and retries quota (429) and server (5xx) errors with jittered exponential backoff.
+    # A 5xx may come after the server applied the request, so those are only retried
+    # for methods that can be repeated safely (not the POST behind values:append)
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    IDEMPOTENT_METHODS = {"get", "head", "put", "delete"}
+
+    def __init__(self, auth, limiter, count, session=None, max_retries=5, retry_delay=1, max_retry_delay=32):
+        # `count(name, amount)` adds to the owner's counters
+        super().__init__(auth, session)
+        self.limiter = limiter
+        self.count = count
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+    def request(self, method, *args, **kwargs):
+        delay = self.retry_delay
+        for attempt in range(self.max_retries + 1):
+            waited = self.limiter.acquire(current_priority())
+            self.count("requests")
+            if waited > 0.001:
+                self.count("throttled")
+                self.count("throttled_seconds", waited)
+
+            try:
+                return super().request(method, *args, **kwargs)
+            except APIError as e:
+                status = e.response.status_code
+                if status not in self.RETRY_STATUSES:
+                    raise
+                self.count("quota_errors" if status == 429 else "server_errors")
+                if status != 429 and method.lower() not in self.IDEMPOTENT_METHODS:
+                    raise
+                if attempt == self.max_retries:
+                    self.count("gave_up")
+                    raise
+                if status == 429:
+                    self.limiter.drain()
+
+            self.count("retries")
+            time.sleep(delay * random.uniform(0.5, 1.5))
+            delay = min(delay * 2, self.max_retry_delay)
+
+
+class Gsheet(StorageBackend):
+    # One instance is shared by the whole process: gspread clients are pooled (one per
+    # concurrent caller) on top of a single set of credentials, so the token is only
+    # fetched again once it expires, and workbook / worksheet handles are kept around.
+    # All clients share one token bucket sized to the per-minute Sheets quota.
+
+    def __init__(self, config_dict, pool_size=4, requests_per_minute=60, burst=10):
+        self.credentials = Credentials.from_service_account_info(config_dict, scopes=DEFAULT_SCOPES)
+        self.pool_size = pool_size
+        self.limiter = TokenBucket(requests_per_minute / 60, burst)
+        self.stats = {
+            "clients": 0, "token_refreshes": 0, "checkouts": 0, "workbook_opens_saved": 0, "worksheet_lookups_saved": 0, "fingerprint_checks": 0,
+            "requests": 0, "throttled": 0, "throttled_seconds": 0, "retries": 0, "quota_errors": 0, "server_errors": 0, "gave_up": 0
+        }
+        self._lock = threading.Lock()
+        self._idle = queue.LifoQueue()
+
+        self._refresh_lock = threading.Lock()
+        refresh = self.credentials.refresh
+
+        def shared_refresh(request):
+            # clients share the credentials, so concurrent expiries only fetch one token
+            token = self.credentials.token
+            with self._refresh_lock:
+                if self.credentials.token is not None and self.credentials.token != token:
+                    return
+                refresh(request)
+            with self._lock:
+                self.stats["token_refreshes"] += 1
+
+        self.credentials.refresh = shared_refresh
+
+    @contextmanager
+    def _client(self):
+        # an idle pooled client, a new one while the pool isn't full, else wait for one
+        with self._lock:
+            self.stats["checkouts"] += 1
+            try:
+                entry = self._idle.get_nowait()
+            except queue.Empty:
+                entry = None
+                if self.stats["clients"] < self.pool_size:
+                    self.stats["clients"] += 1
+                    entry = {"client": QuotaAwareClient(self.credentials, self.limiter, self._count), "workbooks": {}, "worksheets": {}}
+        if entry is None:
+            entry = self._idle.get()
         try:
-            worksheet = workbook.worksheet(worksheet_name)
-        except:
-            worksheet = workbook.add_worksheet(worksheet_name, 1000, 20)
-        worksheet.append_row(expense_details)
\ No newline at end of file
+            yield entry
+        finally:
+            self._idle.put(entry)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def _workbook(self, entry, workbook_name):
+        workbook = entry["workbooks"].get(workbook_name)
+        if workbook is None:
+            workbook = entry["workbooks"][workbook_name] = entry["client"].open(workbook_name)
+        else:
+            with self._lock:
+                self.stats["workbook_opens_saved"] += 1
+        return workbook
+
+    def _worksheet(self, entry, workbook_name, worksheet_name, refresh=False):
+        key = (workbook_name, worksheet_name)
+        worksheet = None if refresh else entry["worksheets"].get(key)
+        if worksheet is None:
+            worksheet = entry["worksheets"][key] = self._workbook(entry, workbook_name).worksheet(worksheet_name)
+        else:
+            with self._lock:
+                self.stats["worksheet_lookups_saved"] += 1
+        return worksheet
+
+    def get_stats(self):
+        # every client used to be built per call, each one exchanging a token on its
+        # first request; opening a workbook costs 2 requests, a worksheet lookup 1
+        with self._lock:
+            stats = dict(self.stats)
+        stats["auth_handshakes"] = stats["token_refreshes"]
+        stats["auth_handshakes_saved"] = max(stats["checkouts"] - stats["token_refreshes"], 0)
+        stats["requests_saved"] = stats["auth_handshakes_saved"] + 2 * stats["workbook_opens_saved"] + stats["worksheet_lookups_saved"]
+        stats["throttled_seconds"] = round(stats["throttled_seconds"], 3)
+        return stats
+
+    @instrumented("gsheet.get_sheet_data")
+    def get_sheet_data(self, workbook_name, worksheet_name):
+        # a missing worksheet is a KeyError, as on the other backends
+        with self._client() as entry:
+            try:
+                worksheet = self._worksheet(entry, workbook_name, worksheet_name)
+            except WorksheetNotFound:
+                raise KeyError(worksheet_name) from None
+            return pd.DataFrame(worksheet.get_all_records())
+
+    @instrumented("gsheet.get_sheets_data")
+    def get_sheets_data(self, workbook_name, worksheet_names):
+        # several worksheets in a single values.batchGet call, missing worksheets are left out
+        with self._client() as entry:
+            workbook = self._workbook(entry, workbook_name)
+            existing_names = {worksheet.title for worksheet in workbook.worksheets()}
+            worksheet_names = [name for name in worksheet_names if name in existing_names]
+
+            if not worksheet_names:
+                return {}
+
+            value_ranges = workbook.values_batch_get([absolute_range_name(name) for name in worksheet_names])["valueRanges"]
+        return {
+            name: records_frame(fill_gaps(value_range.get("values", [])))
+            for name, value_range in zip(worksheet_names, value_ranges)
+        }
+
+    @instrumented("gsheet.get_sheet_rows")
+    def get_sheet_rows(self, workbook_name, worksheet_name, start_row=0):
+        # data rows from `start_row` (0 based, header excluded) to the end of the sheet
+        first_sheet_row = start_row + 2
+        with self._client() as entry:
+            worksheet = self._worksheet(entry, workbook_name, worksheet_name)
+            # a kept handle may predate rows added since, look the grid size up again
+            if first_sheet_row > worksheet.row_count:
+                worksheet = self._worksheet(entry, workbook_name, worksheet_name, refresh=True)
+            if first_sheet_row > worksheet.row_count:
+                return pd.DataFrame(columns=worksheet.row_values(1))
+
+            # open ended row range, so rows past a stale row_count are still read
+            last_column = re.sub(r"\d", "", rowcol_to_a1(1, worksheet.col_count))
+            header, rows = worksheet.batch_get(["1:1", f"A{first_sheet_row}:{last_column}"])
+        df = records_frame([header[0]] + [row[:len(header[0])] + [""] * (len(header[0]) - len(row)) for row in rows])
+        df.index += start_row
+        return df
+
+    @instrumented("gsheet.get_fingerprints")
+    def get_fingerprints(self, workbook_name, worksheet_names):
+        # the Sheets API keeps no per-worksheet revision, the spreadsheet's Drive
+        # modifiedTime is the cheapest signal: one small request for every worksheet
+        with self._client() as entry:
+            workbook = self._workbook(entry, workbook_name)
+            modified_time = entry["client"].request(
+                "get",
+                f"{DRIVE_FILES_API_V3_URL}/{workbook.id}",
+                params={"fields": "modifiedTime", "supportsAllDrives": True}
+            ).json()["modifiedTime"]
+        with self._lock:
+            self.stats["fingerprint_checks"] += 1
+        return {name: modified_time for name in worksheet_names}
+
+    def append_rows(self, workbook_name, worksheet_name, rows):
+        # all rows in one append request, the worksheet is created if it doesn't exist yet
+        with timed("gsheet.append_rows", worksheet=worksheet_name, rows=len(rows)), self._client() as entry:
+            try:
+                worksheet = self._worksheet(entry, workbook_name, worksheet_name)
+            except WorksheetNotFound:
+                worksheet = entry["worksheets"][(workbook_name, worksheet_name)] = self._workbook(entry, workbook_name).add_worksheet(worksheet_name, 1000, 20)
+            worksheet.append_rows(rows)
@@ -0,0 +1,84 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+import pandas as pd
+
+# Stage timings, turned on with DEBUG_TIMINGS=1. Each finished stage is logged as one
+# JSON line and kept on the current thread, which for a Streamlit rerun is the script
+# thread, so the debug panel can show the run that just happened. When disabled the
+# context manager and decorator do nothing but one flag check.
+
+ENABLED = os.environ.get("DEBUG_TIMINGS", "").lower() in ["1", "true", "yes"]
+
+logger = logging.getLogger("instrumentation")
+if ENABLED and not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_local = threading.local()
+
+
+def start_run(name):
+    # drop the records of the previous rerun on this thread
+    if ENABLED:
+        _local.run = {"name": name, "started_at": time.perf_counter(), "records": []}
+        _local.depth = 0
+
+
+def get_run():
+    return getattr(_local, "run", None)
+
+
+def describe(value):
+    # rows and in-memory bytes of a frame, or of every frame in a dict of frames
+    if isinstance(value, pd.DataFrame):
+        return {"rows": value.shape[0], "bytes": int(value.memory_usage(deep=True).sum())}
+    if isinstance(value, dict) and value and all(isinstance(v, pd.DataFrame) for v in value.values()):
+        sizes = [describe(v) for v in value.values()]
+        return {"rows": sum(s["rows"] for s in sizes), "bytes": sum(s["bytes"] for s in sizes)}
+    return {}
+
+
+@contextmanager
+def timed(stage, **fields):
+    # the block can add fields to the yielded dict, e.g. fields.update(describe(df))
+    if not ENABLED:
+        yield {}
+        return
+
+    depth = getattr(_local, "depth", 0)
+    _local.depth = depth + 1
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        _local.depth = depth
+        record = {"stage": stage, "ms": round((time.perf_counter() - start) * 1000, 3), "depth": depth, **fields}
+        run = get_run()
+        if run is not None:
+            record["run"] = run["name"]
+            record["offset_ms"] = round((start - run["started_at"]) * 1000, 3)
+            run["records"].append(record)
+        logger.info(json.dumps(record, default=str))
+
+
+def instrumented(stage):
+    # decorator version of `timed`, frames returned by the function are sized
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with timed(stage) as fields:
+                result = fn(*args, **kwargs)
+                fields.update(describe(result))
+                return result
+        return wrapper
+    return decorator
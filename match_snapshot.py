@@ -0,0 +1,124 @@
+import fcntl
+import glob
+import json
+import os
+import threading
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+
+def concat_frames(frames):
+    # pd.concat falls back to object for categoricals whose categories differ, so union
+    # them per group of columns that shared a dtype in the first frame
+    df = pd.concat(frames)
+    column_groups = {}
+    for col, dtype in frames[0].dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype) and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            column_groups.setdefault(dtype, []).append(col)
+
+    for dtype, cols in column_groups.items():
+        categories = pd.Index(np.unique(np.concatenate([frame[col].cat.categories.to_numpy(dtype=object) for frame in frames for col in cols])))
+        for col in cols:
+            df[col] = pd.Categorical(df[col], categories=categories, ordered=dtype.ordered)
+
+    return df
+
+
+class MatchSnapshot:
+    # Local parquet copy of the normalized match frame plus the sheet position it
+    # was synced up to. Each sync appends one part file holding only the new rows.
+    # Server processes can share the directory: a sync runs under locked(), and the
+    # meta file on disk rather than this process's copy says what is in it.
+
+    def __init__(self, directory, max_parts=50):
+        self.directory = directory
+        self.max_parts = max_parts
+        self.meta_path = os.path.join(directory, "matches.json")
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._depth = 0
+        self._df = None
+        self._meta = None
+        # the meta file as this process last read or wrote it
+        self._seen_meta = None
+
+    @contextmanager
+    def locked(self):
+        # an exclusive lock on the directory, reentrant within the thread holding it
+        with self._lock:
+            if self._depth == 0:
+                os.makedirs(self.directory, exist_ok=True)
+                self._lock_file = open(os.path.join(self.directory, "matches.lock"), "a")
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def _part_paths(self):
+        return sorted(glob.glob(os.path.join(self.directory, "matches-*.parquet")))
+
+    def _write_meta(self, meta):
+        tmp_meta_path = f"{self.meta_path}.tmp"
+        with open(tmp_meta_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta_path, self.meta_path)
+
+    def _read_meta(self):
+        if not os.path.exists(self.meta_path):
+            return None
+        with open(self.meta_path) as f:
+            return json.load(f)
+
+    def load(self):
+        # the frame is only read again when another process has written since
+        with self.locked():
+            meta = self._read_meta()
+            if self._meta is None or meta != self._seen_meta:
+                self._seen_meta = meta
+                self._df = None
+                self._meta = {"synced_rows": 0, "last_raw_timestamp": None, "parts": 0}
+                part_paths = self._part_paths()
+                # fewer parts than recorded means an interrupted compaction, start over
+                if meta is not None and meta["parts"] > 0 and len(part_paths) >= meta["parts"]:
+                    self._meta = meta
+                    self._df = concat_frames([pd.read_parquet(path) for path in part_paths[:meta["parts"]]])
+            return self._df, dict(self._meta)
+
+    def append(self, new_df, synced_rows, last_raw_timestamp):
+        # `new_df` follows on from what load() returned, under the same locked()
+        with self.locked():
+            if self._read_meta() != self._seen_meta:
+                raise RuntimeError("match snapshot was written by another process since it was loaded")
+            df = new_df if self._df is None else concat_frames([self._df, new_df])
+            parts = self._meta["parts"] + 1
+
+            if parts > self.max_parts:
+                for path in self._part_paths():
+                    os.remove(path)
+                df.to_parquet(os.path.join(self.directory, "matches-000001.parquet"))
+                parts = 1
+            else:
+                new_df.to_parquet(os.path.join(self.directory, f"matches-{parts:06d}.parquet"))
+
+            # the meta file is written last so a crash mid-sync leaves the previous state readable
+            self._meta = {"synced_rows": synced_rows, "last_raw_timestamp": last_raw_timestamp, "parts": parts}
+            self._write_meta(self._meta)
+            self._seen_meta = dict(self._meta)
+            self._df = df
+            return df
+
+    def clear(self):
+        with self.locked():
+            if os.path.exists(self.meta_path):
+                os.remove(self.meta_path)
+            for path in self._part_paths():
+                os.remove(path)
+            self._df = None
+            self._meta = {"synced_rows": 0, "last_raw_timestamp": None, "parts": 0}
+            self._seen_meta = None
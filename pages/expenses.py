@@ -5,6 +5,9 @@ import pandas as pd
 import numpy as np
 import utils
 import media.icon_constants as icons
+import instrumentation
+from sections import data_status, debug_panel
+from engine.expenses import get_balances, explode_shuttle_expenses, get_player_shares
 from datetime import datetime
 from st_aggrid import AgGrid, GridOptionsBuilder, AgGridTheme, JsCode
 
@@ -16,91 +19,15 @@ def text_color(amount):
     else:
         return "tomato"
 
-def get_players_on_date(df: pd.DataFrame):
-    players_on_date = df[['date', 'team_1_player_1', 'team_1_player_2', 'team_2_player_1', 'team_2_player_2']].copy()
-
-    players_on_date = players_on_date.groupby("date").agg({
-        'team_1_player_1': 'unique',
-        'team_1_player_2': 'unique',
-        'team_2_player_1': 'unique',
-        'team_2_player_2': 'unique'
-    })
-
-    players_on_date['players'] = players_on_date[['team_1_player_1', 'team_1_player_2', 'team_2_player_1', 'team_2_player_2']].apply(
-        lambda x: [i for i in set(', '.join([', '.join(x[i]) for i in range(4)]).split(', ')) if i != 'other'], 
-        axis=1
-    )
-    players_on_date = players_on_date[['players']]
-    players_on_date['number_of_players'] = players_on_date['players'].str.len()
-
-    return players_on_date
-
-def get_balances(player_share_df: pd.DataFrame, settlements_df: pd.DataFrame, shuttle_expenses: pd.DataFrame):
-    balances = player_share_df.groupby(['players', 'paid_by'][::-1]).agg({
-        'date': 'count',
-        'share': 'sum'
-    }).reset_index()
-
-    transformed_shuttle_expenses = shuttle_expenses[['paid_by', 'covered_for', 'expense_id', 'share']]
-    transformed_shuttle_expenses.columns = ['paid_by', 'players', 'date', 'share']
-
-    balances = pd.concat([balances, transformed_shuttle_expenses]).groupby(["paid_by", "players"]).agg({"share": "sum", "date": "min"}).reset_index()
-
-    balances = balances[balances['paid_by'] != balances['players']]
-
-    balances = pd.merge(
-        balances,
-        balances,
-        left_on=['paid_by', 'players'],
-        right_on=['players', 'paid_by'],
-        how="left"
-    )
-
-    balances['owes'] = np.where(
-        balances['paid_by_y'].isna(),
-        balances['share_x'],
-        np.where(
-            balances['share_x'] > balances['share_y'],
-            balances['share_x'] - balances['share_y'],
-            0
-        )
-    )
-
-    balances = balances[['players_x', 'paid_by_x', 'owes', 'date_x']]
-    balances.columns = ['player', 'owes_to', 'amount', 'for_days']
-
-    balances_post_settlement = pd.merge(
-        balances,
-        settlements_df,
-        left_on=['player', 'owes_to'],
-        right_on=['paid_by', 'paid_to'],
-        how = "left"
-    )
-
-    balances_post_settlement['amount'] = np.where(
-        balances_post_settlement['paid_to'].isna(),
-        balances_post_settlement['amount_x'],
-        np.where(
-            balances_post_settlement['amount_x'] > balances_post_settlement['amount_y'],
-            balances_post_settlement['amount_x'] - balances_post_settlement['amount_y'],
-            0
-        )
-    )
-
-    balances_post_settlement = balances_post_settlement[['player', 'owes_to', 'amount']].round(decimals=2)
-
-    return balances_post_settlement
 
+instrumentation.start_run("expenses")
+utils.start_background_refresh()
+utils.prefetch_sheet_data(["matches", "expense_tracker", "shuttle_expense_tracker", "settlements"])
 
 df = utils.get_data()
 all_players = list(np.unique(df[["team_1_player_1", "team_1_player_2", "team_2_player_1", "team_2_player_2"]].values))
 all_players.remove("other")
-shuttle_expenses = utils.get_shuttle_expenses_data()
-shuttle_expenses['covered_for'] = shuttle_expenses['shared_by'].str.split(', ')
-shuttle_expenses['share'] = shuttle_expenses['amount'] / shuttle_expenses['covered_for'].apply(len)
-
-shuttle_expenses = shuttle_expenses.explode('covered_for')[['expense_id', 'record_date', 'paid_by', 'amount', 'share', 'covered_for', 'comments']]
-shuttle_expenses = shuttle_expenses[shuttle_expenses['paid_by'] != shuttle_expenses['covered_for']]
+shuttle_expenses = explode_shuttle_expenses(utils.get_shuttle_expenses_data())
 
 with st.sidebar:
     with st.form("add_expense", clear_on_submit=True):
@@ -112,14 +39,15 @@ with st.sidebar:
         if add_new_expense:
             utils.add_expense_data([f'{game_date}', amount, paid_by])
 
-players_on_date_df = get_players_on_date(df)
+attendance = utils.get_attendance()
+players_on_date_df = attendance.players_on_date()
 
 st.markdown(f"<h1>{icons.EXPENSE_TRACKER}&nbsp; Expense Tracker</h1>", unsafe_allow_html=True)
 
 expenses_tracked = True
 try:
     expenses_df = utils.get_expenses_data().sort_values('date')
-    settlements_df = utils.get_settlements_data().groupby(['paid_by', 'paid_to']).sum('amount').reset_index()
+    settlements_df = utils.get_settlements_data().groupby(['paid_by', 'paid_to'])['amount'].sum().reset_index()
 except:
     expenses_tracked = False
 
@@ -130,10 +58,14 @@ else:
     costliest_day = expenses_df.iloc[expenses_df['amount'].idxmax(), 0]
     expenses_df['paid_by'] = expenses_df['paid_by']
 
-    builder = GridOptionsBuilder.from_dataframe(expenses_df)
+    def build_expenses_grid_options():
+        builder = GridOptionsBuilder.from_dataframe(expenses_df)
+
+        grid_options = builder.build()
+        grid_options['getRowStyle'] = utils.get_js_code_for_row_color('date', costliest_day)
+        return grid_options
 
-    grid_options = builder.build()
-    grid_options['getRowStyle'] = utils.get_js_code_for_row_color('date', costliest_day)
+    grid_options = utils.grid_options("expenses", expenses_df, build_expenses_grid_options, costliest_day=costliest_day)
 
     overall_expenses_cols = st.columns([4, 3])
 
@@ -156,12 +88,12 @@ else:
             </div>
         ''', unsafe_allow_html=True)
 
-    player_share_df = pd.merge(players_on_date_df.explode('players'), expenses_df, how="inner", on="date")
-    player_share_df['share'] = player_share_df['amount'] / player_share_df['number_of_players']
+    player_share_df = get_player_shares(attendance, expenses_df)
 
     st.markdown("<hr>", unsafe_allow_html=True)
     st.markdown(f"<h5>{icons.CALCULATOR}&nbsp;Balances</h5>", unsafe_allow_html=True)
-    balances = get_balances(player_share_df, settlements_df, shuttle_expenses)
+    with instrumentation.timed("get_balances"):
+        balances = get_balances(player_share_df, settlements_df, shuttle_expenses)
     balances_dict = balances[balances['amount'] > 0].to_dict(orient='records')
 
     for balance in balances_dict:
@@ -182,27 +114,31 @@ else:
 
     # merged_df['players'] = "<span>" + merged_df['players'].str.join("</span> <span>") + "</span>"
 
-    builder = GridOptionsBuilder.from_dataframe(merged_df)
-
-    builder.configure_columns(merged_df.columns, width=140)
-
-    builder.configure_column(
-        "players", 
-        width=500,
-        cellRenderer=JsCode("""
-        class UrlCellRenderer {
-            init(params) {
-                this.eGui = document.createElement('div'); 
-                this.eGui.innerHTML = '<span class="tablets">' + params.value.join('</span> <span class="tablets">') + '</span>';
+    def build_attendance_grid_options():
+        builder = GridOptionsBuilder.from_dataframe(merged_df)
+
+        builder.configure_columns(merged_df.columns, width=140)
+
+        builder.configure_column(
+            "players", 
+            width=500,
+            cellRenderer=JsCode("""
+            class UrlCellRenderer {
+                init(params) {
+                    this.eGui = document.createElement('div'); 
+                    this.eGui.innerHTML = '<span class="tablets">' + params.value.join('</span> <span class="tablets">') + '</span>';
+                }
+                getGui() {
+                    return this.eGui;
+                }
             }
-            getGui() {
-                return this.eGui;
-            }
-        }
-    """)
-    )
+        """)
+        )
 
-    grid_options = builder.build()
+        return builder.build()
+
+    # the options only depend on the columns, not the rows
+    grid_options = utils.grid_options("attendance", merged_df.dtypes.astype(str), build_attendance_grid_options)
 
     AgGrid(
         # pd.merge(players_on_date_df, expenses_df, how="inner", on="date"),
@@ -223,29 +159,32 @@ else:
     cost_analysis_cols = st.columns(3)
     venue_wise_expenditure = pd.merge(
         expenses_df,
-        df[['date', 'venue']].drop_duplicates(),
+        df[['date', 'venue']].assign(date=df['date'].dt.strftime("%Y-%m-%d"), venue=df['venue'].astype(str)).drop_duplicates(),
         left_on='date',
         right_on='date'
     ).groupby('venue').sum('amount').reset_index()
 
 
     with cost_analysis_cols[2]:
-        venue_costs_pie = px.pie(
-            venue_wise_expenditure,
-            values="amount",
-            names='venue',
-            template="plotly_white",
-            color_discrete_sequence=px.colors.sequential.Aggrnyl[-venue_wise_expenditure.shape[0]:],
-            title="Venue wise cost",
-            hole=0.3,
-            width=350
-        )
-        venue_costs_pie.update_layout(showlegend=False, margin=dict(l=40))
-        venue_costs_pie.update_traces(pull=0.05)
-        st.plotly_chart(venue_costs_pie)
+        def build_venue_costs_pie():
+            venue_costs_pie = px.pie(
+                venue_wise_expenditure,
+                values="amount",
+                names='venue',
+                template="plotly_white",
+                color_discrete_sequence=px.colors.sequential.Aggrnyl[-venue_wise_expenditure.shape[0]:],
+                title="Venue wise cost",
+                hole=0.3,
+                width=350
+            )
+            venue_costs_pie.update_layout(showlegend=False, margin=dict(l=40))
+            venue_costs_pie.update_traces(pull=0.05)
+            return venue_costs_pie
+
+        utils.plotly_chart("venue_costs_pie", venue_wise_expenditure, build_venue_costs_pie)
 
     with cost_analysis_cols[1]:
-        monthly_expenditure = expenses_df.copy()
+        monthly_expenditure = expenses_df[['date', 'amount']].copy()
         monthly_expenditure['month'] = pd.to_datetime(monthly_expenditure['date']).dt.month
 
         monthly_expenditure = monthly_expenditure.groupby(
@@ -259,35 +198,39 @@ else:
         )
 
         monthly_expenditure = monthly_expenditure.sort_values('month', ascending=False)
-        monthly_expenditure_fig = go.Figure(
-            go.Bar(
-                y=monthly_expenditure.index,
-                x=monthly_expenditure['amount'],
-                orientation='h',
-                marker_color=monthly_expenditure['color']
+
+        def build_monthly_expenditure_fig():
+            monthly_expenditure_fig = go.Figure(
+                go.Bar(
+                    y=monthly_expenditure.index,
+                    x=monthly_expenditure['amount'],
+                    orientation='h',
+                    marker_color=monthly_expenditure['color']
+                )
             )
-        )
 
-        monthly_expenditure_fig.update_layout(width=300, title="Monthy Expenditure", margin=dict(l=40))
+            monthly_expenditure_fig.update_layout(width=300, title="Monthy Expenditure", margin=dict(l=40))
+            return monthly_expenditure_fig
 
-        st.plotly_chart(
-            monthly_expenditure_fig
-        )
+        utils.plotly_chart("monthly_expenditure_fig", monthly_expenditure, build_monthly_expenditure_fig)
 
     with cost_analysis_cols[0]:
         monthly_expenditure['prev_month_expense'] = monthly_expenditure['amount'].shift(-1)
         curr_month_expense = monthly_expenditure.reset_index().iloc[0, :].to_dict()
 
-        metric_fig = go.Figure(
-            go.Indicator(
-                mode="number+delta",
-                value=curr_month_expense["amount"],
-                title=curr_month_expense["date"],
-                delta={"reference": curr_month_expense["prev_month_expense"]}
-            )
-        ).update_traces(gauge_bar_color="#8bc34a").update_layout(width=300, margin=dict(l=80, b=50, t=0))
-
-        st.plotly_chart(metric_fig)
+        utils.plotly_chart(
+            "monthly_expense_metric",
+            None,
+            lambda: go.Figure(
+                go.Indicator(
+                    mode="number+delta",
+                    value=curr_month_expense["amount"],
+                    title=curr_month_expense["date"],
+                    delta={"reference": curr_month_expense["prev_month_expense"]}
+                )
+            ).update_traces(gauge_bar_color="#8bc34a").update_layout(width=300, margin=dict(l=80, b=50, t=0)),
+            curr_month_expense=curr_month_expense
+        )
 
     st.markdown("---")
 
@@ -316,3 +259,6 @@ else:
             if shuttle_expense_add:
                 utils.add_shuttle_expense_data([f'{datetime.now().date()}', shuttle_paid_by, shuttle_amount, ', '.join(shared_by), comments])
                 # utils.add_settlement_data([f'{datetime.now().date()}', paid_by, paid_to, amount])
+
+data_status.display_data_status()
+debug_panel.display_debug_panel()
@@ -1,9 +1,13 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from sections import individual_stats
+from sections import individual_stats, data_status, debug_panel
 import utils
 import media.icon_constants as icons
+import instrumentation
+
+instrumentation.start_run("player_stats")
+utils.start_background_refresh()
 
 df = utils.get_data()
 all_players = list(np.unique(df[["team_1_player_1", "team_1_player_2", "team_2_player_1", "team_2_player_2"]].values))
@@ -14,16 +18,51 @@ cols[0].markdown(f"<h1>Individual stats &nbsp;{icons.PLAYER}</h1>", unsafe_allow
 
 player = cols[1].selectbox(label="Player Name", options=all_players)
 
-player_matches = utils.get_player_stats(player, df)
+with st.sidebar:
+    venue = st.selectbox(label="Venue", options=["all venues"] + sorted(df["venue"].unique()))
+    date_range = st.date_input(label="Date Range", value=(df["date"].min().date(), df["date"].max().date()))
+
+# every derived value below is built from this same `df`
+match_index = utils.get_match_index(df)
+player_game_rows = match_index.find(
+    player,
+    venue=None if venue == "all venues" else venue,
+    start_date=date_range[0],
+    end_date=date_range[-1]
+)
+
+if len(player_game_rows) == 0:
+    st.warning(f"No games found for {player} with the selected filters")
+    st.stop()
+
+# the whole-history partner table is a row of the cached synergy matrix
+unfiltered = venue == "all venues" and date_range[0] <= df["date"].min().date() and date_range[-1] >= df["date"].max().date()
+player_partner_stats = utils.get_partner_synergy(df).partner_stats(player, None if unfiltered else player_game_rows)
+player_cube = utils.get_aggregate_cube(df).player_view(
+    player,
+    venue=None if venue == "all venues" else venue,
+    start_date=date_range[0],
+    end_date=date_range[-1]
+)
 st.markdown(f"<hr><h5>{icons.STATS_ICON}&nbsp;Player Stats</h5>", unsafe_allow_html=True)
-individual_stats.display_player_win_loss_stats(player_matches)
+individual_stats.display_player_win_loss_stats(player_cube)
+
+
+### Player rating
+st.markdown(f"<hr><h5>{icons.STATS_ICON}&nbsp;Player Rating</h5>", unsafe_allow_html=True)
+rating_history = utils.get_ratings(df).history_of(player)
+rating_history = rating_history[rating_history["timestamp"].dt.date.between(date_range[0], date_range[-1])]
+individual_stats.display_player_rating_history(rating_history, player)
 
 
 ### Partner wise stats
 st.markdown(f"<hr><h5>{icons.TEAMMATE}&nbsp;Player - Partner stats</h5>", unsafe_allow_html=True)
-individual_stats.display_player_partner_stats(player_matches, player)
+individual_stats.display_player_partner_stats(player_partner_stats, player)
 
 
 ### Player Daily stats
 st.markdown(f"<hr><h5>{icons.CALENDAR}&nbsp;Player - Date wise stats</h5>", unsafe_allow_html=True)
-individual_stats.display_player_daily_stats(player_matches, player)
\ No newline at end of file
+individual_stats.display_player_daily_stats(player_cube, player, utils.get_rolling_stats(df).rows(player_game_rows))
+
+data_status.display_data_status()
+debug_panel.display_debug_panel()
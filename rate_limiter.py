@@ -0,0 +1,65 @@
+import threading
+import time
+from contextlib import contextmanager
+
+FOREGROUND = 0
+BACKGROUND = 1
+
+_local = threading.local()
+
+
+@contextmanager
+def priority(level):
+    # requests made by this thread inside the block queue at `level`
+    previous = current_priority()
+    _local.priority = level
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+def current_priority():
+    return getattr(_local, "priority", FOREGROUND)
+
+
+class TokenBucket:
+    # Requests take a token each; tokens come back at `rate` per second up to
+    # `capacity`. A caller only gets a token when nobody of a higher priority
+    # (lower number) is waiting, so page renders overtake background work.
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._waiting = [0, 0]
+
+    def _refill(self):
+        # called with the lock held
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority=FOREGROUND):
+        # blocks until a token is ours, returns the seconds spent waiting
+        start = time.monotonic()
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    self._refill()
+                    if self._tokens >= 1 and not any(self._waiting[:priority]):
+                        self._tokens -= 1
+                        return time.monotonic() - start
+                    self._cond.wait((1 - self._tokens) / self.rate if self._tokens < 1 else None)
+            finally:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+
+    def drain(self):
+        # the server said slow down: everyone waits for tokens to build up again
+        with self._cond:
+            self._refill()
+            self._tokens = 0
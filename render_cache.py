@@ -0,0 +1,67 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+
+def content_hash(*values):
+    # a digest of frames, arrays and plain parameters, equal whenever their contents are
+    digest = hashlib.blake2b(digest_size=16)
+    for value in values:
+        if isinstance(value, np.ndarray):
+            value = pd.Series(value.ravel())
+        if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+            labels = getattr(value, "columns", getattr(value, "name", None))
+            digest.update(repr((type(value).__name__, labels)).encode())
+            try:
+                digest.update(pd.util.hash_pandas_object(value, index=not isinstance(value, pd.Index)).to_numpy().tobytes())
+            except TypeError:
+                # columns of lists aren't hashable, fall back to their text
+                digest.update(value.to_json(date_format="iso").encode())
+        else:
+            digest.update(repr(value).encode())
+    return digest.hexdigest()
+
+
+class RenderCache:
+    # Process-wide LRU of rendered output (plotly figures, grid options) bounded by the
+    # total size of the cached values. Shared by every session like the data cache.
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key, builder, size=len):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[0]
+            self.stats["misses"] += 1
+
+        value = builder()
+        nbytes = size(value)
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (value, nbytes)
+                self._bytes += nbytes
+            # the newest entry always stays, even when it is bigger than the budget
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self._bytes -= evicted_bytes
+                self.stats["evictions"] += 1
+        return value
+
+    def get_stats(self):
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries), "bytes": self._bytes}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
@@ -0,0 +1,22 @@
+import streamlit as st
+import pandas as pd
+import utils
+from instrumentation import instrumented
+
+
+@instrumented("display_calendar_heatmap")
+def display_calendar_heatmap(dates, counts, key):
+    years = sorted(pd.to_datetime(pd.Series(dates)).dt.year.unique(), reverse=True)
+    year = st.selectbox(label="Year", options=years + ["All time"], key=key)
+
+    if year == "All time":
+        start_date, end_date = None, None
+    else:
+        start_date, end_date = f"{year}-01-01", f"{year}-12-31"
+
+    utils.plotly_chart(
+        "calendar_heatmap",
+        pd.DataFrame({"date": dates, "count": counts}),
+        lambda: utils.create_calendar_heatmap_figure(dates, counts, start_date, end_date),
+        year=year
+    )
@@ -0,0 +1,10 @@
+import streamlit as st
+from datetime import datetime
+import utils
+
+
+def display_data_status():
+    # when the data on screen was last checked against the sheet
+    as_of = utils.get_data_as_of()
+    if as_of is not None:
+        st.sidebar.caption(f"Data as of {datetime.fromtimestamp(as_of):%Y-%m-%d %H:%M:%S}")
@@ -0,0 +1,25 @@
+import streamlit as st
+import pandas as pd
+import time
+import utils
+import instrumentation
+
+
+def display_debug_panel():
+    # sidebar breakdown of the rerun that just finished, only with DEBUG_TIMINGS=1
+    run = instrumentation.get_run()
+    if not instrumentation.ENABLED or run is None:
+        return
+
+    records = sorted(run["records"], key=lambda record: record.get("offset_ms", 0))
+    timings = pd.DataFrame({
+        "stage": ["· " * record["depth"] + record["stage"] for record in records],
+        "ms": [record["ms"] for record in records],
+        "rows": [record.get("rows") for record in records],
+        "kb": [round(record["bytes"] / 1024, 1) if "bytes" in record else None for record in records],
+    })
+
+    with st.sidebar.expander("Timings", expanded=True):
+        st.caption(f"{run['name']}: {(time.perf_counter() - run['started_at']) * 1000:.0f} ms")
+        st.dataframe(timings, use_container_width=True)
+        st.json({"backend": utils.get_backend().get_stats(), "sheet_cache": utils.sheet_cache.stats, "render_cache": utils.render_cache.get_stats(), "background_refresher": utils.background_refresher.stats})
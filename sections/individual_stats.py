@@ -4,39 +4,41 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 import utils
+from instrumentation import instrumented
 from st_aggrid import AgGrid, GridOptionsBuilder, AgGridTheme, ColumnsAutoSizeMode
-from datetime import datetime, timedelta
-import json
+from sections import calendar_heatmap
+from engine.cube import roll_up
 
 
-def display_player_win_loss_stats(player_matches: pd.DataFrame):
+@instrumented("display_player_win_loss_stats")
+def display_player_win_loss_stats(player_cube: pd.DataFrame):
     player_win_loss_columns = st.columns([3, 1, 2])
-    player_win_loss_df = player_matches.groupby("result").agg(**{
-        "total_games": pd.NamedAgg("result", "count"), 
-        "average_ppg": pd.NamedAgg("player_team_points", "mean"),
-        **{f"{fn}_margin": pd.NamedAgg("margin", fn) for fn in ["mean", "max", "min"]}
-    }).round(decimals=2)
-
-    win_loss_pie = px.pie(
-        player_win_loss_df,
-        values="total_games",
-        names=player_win_loss_df.index,
-        template="plotly_white",
-        color=player_win_loss_df.index,
-        color_discrete_map={"win":'#9ccc65', "loss":'#37474f'},
-        hole=0.3
-    )
-    win_loss_pie.update_traces(pull=0.05)
-    win_loss_pie.update_layout(width=300, showlegend=False, margin=dict(b=80, t=120))
-    player_win_loss_columns[2].plotly_chart(
-        win_loss_pie
-    )
+    player_win_loss_df = roll_up(player_cube, ["result"]).round(decimals=2)
+
+    def build_win_loss_pie():
+        win_loss_pie = px.pie(
+            player_win_loss_df,
+            values="total_games",
+            names=player_win_loss_df.index,
+            template="plotly_white",
+            color=player_win_loss_df.index,
+            color_discrete_map={"win":'#9ccc65', "loss":'#37474f'},
+            hole=0.3
+        )
+        win_loss_pie.update_traces(pull=0.05)
+        win_loss_pie.update_layout(width=300, showlegend=False, margin=dict(b=80, t=120))
+        return win_loss_pie
+
+    utils.plotly_chart("win_loss_pie", player_win_loss_df, build_win_loss_pie, container=player_win_loss_columns[2])
 
     player_win_loss_columns[0].markdown('<h6 style="margin-top: 40px">Overall Stats:</h6>', unsafe_allow_html=True)
 
-    builder = GridOptionsBuilder.from_dataframe(player_win_loss_df.T.reset_index())
-    builder.configure_column("index", header_name="Metric")
-    grid_options = builder.build()
+    def build_grid_options():
+        builder = GridOptionsBuilder.from_dataframe(player_win_loss_df.T.reset_index())
+        builder.configure_column("index", header_name="Metric")
+        return builder.build()
+
+    grid_options = utils.grid_options("player_win_loss", player_win_loss_df, build_grid_options)
 
     with player_win_loss_columns[0]:
         AgGrid(
@@ -49,40 +51,23 @@ def display_player_win_loss_stats(player_matches: pd.DataFrame):
             height=400
         )
 
-def display_player_partner_stats(player_matches: pd.DataFrame, player):
+@instrumented("display_player_partner_stats")
+def display_player_partner_stats(player_partner_stats: pd.DataFrame, player):
     player_partner_cols = st.columns([3, 2])
 
-    player_matches['partner'] = np.where(
-        player_matches["belongs_to"] == 'team_1',
-        np.where(
-            player_matches["team_1_player_1"] == player,
-            player_matches["team_1_player_2"],
-            player_matches["team_1_player_1"]
-        ),
-        np.where(
-            player_matches["team_2_player_1"] == player,
-            player_matches["team_2_player_2"],
-            player_matches["team_2_player_1"]
-        ),
-    )
-
-    player_partner_stats = player_matches.groupby(["partner"]).agg(**{
-        "total_games": pd.NamedAgg("result", "count"), 
-        "wins": pd.NamedAgg("is_win", "sum"),
-        "average_ppg": pd.NamedAgg("player_team_points", "mean")
-    })
-    player_partner_stats["win_pct"] = round(player_partner_stats['wins'] * 100 / player_partner_stats['total_games'], 2)
-    player_partner_stats["average_ppg"] = round(player_partner_stats["average_ppg"], 2)
-
     best_teammate = player_partner_stats["win_pct"].idxmax()
     player_partner_stats = player_partner_stats
 
     player_partner_cols[0].markdown('<h6 style="margin-top: 40px">Partnerwise Stats:</h6>', unsafe_allow_html=True)
 
     with player_partner_cols[0]:
-        builder = GridOptionsBuilder.from_dataframe(player_partner_stats.reset_index())
-        grid_options = builder.build()
-        grid_options['getRowStyle'] = utils.get_js_code_for_row_color('partner', best_teammate)
+        def build_grid_options():
+            builder = GridOptionsBuilder.from_dataframe(player_partner_stats.reset_index())
+            grid_options = builder.build()
+            grid_options['getRowStyle'] = utils.get_js_code_for_row_color('partner', best_teammate)
+            return grid_options
+
+        grid_options = utils.grid_options("player_partner_stats", player_partner_stats, build_grid_options, best_teammate=best_teammate)
 
         AgGrid(
             player_partner_stats.reset_index(),
@@ -99,77 +84,30 @@ def display_player_partner_stats(player_matches: pd.DataFrame, player):
 
     player_partner_cols[1].markdown('<h6 style="margin-top: 40px; margin-bottom: 40px">&emsp;&emsp;Partnerwise Win Percentages:</h6>', unsafe_allow_html=True)
 
-    partner_bar_chart = go.Figure(
-        go.Bar(
-            y=player_partner_stats.index,
-            x=player_partner_stats['win_pct'],
-            orientation='h',
-            marker_color=bar_colors,
-            hovertemplate="Win Percentage: %{x} %"
+    def build_partner_bar_chart():
+        partner_bar_chart = go.Figure(
+            go.Bar(
+                y=player_partner_stats.index,
+                x=player_partner_stats['win_pct'],
+                orientation='h',
+                marker_color=bar_colors,
+                hovertemplate="Win Percentage: %{x} %"
+            )
         )
-    )
-    partner_bar_chart.update_layout(
-        plot_bgcolor="white",
-        width=300,
-        margin=dict(b=0, l=100, t=0),
-        height=player_partner_stats.shape[0] * 50
-    )
-
-    player_partner_cols[-1].plotly_chart(
-        partner_bar_chart
-    )
-
-def display_player_daily_stats_heat_map(df):
-    current_year_jan_1 = datetime(datetime.now().year, 1, 1)
-
-    x = list(range(1, 53))
-    y = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
-
-    first_day_ind = y.index(current_year_jan_1.strftime("%a"))
-
-    y = y[first_day_ind:] + y[:first_day_ind]
-
-    df['date'] = pd.to_datetime(df['date'])
-    df['week'] = df['date'].dt.isocalendar().week
-    df['day'] = df['date'].dt.day_of_week
-    df['year'] = df['date'].dt.year
-
-    df = df[df['date'] >= str(current_year_jan_1.date())]
-
-    nz = [[0 for i in range(52)] for j in range(7)]
-    hover_text = np.array([list(range(i, i + 7)) for i in range(0, 364, 7)]).T.tolist()
-    hover_text = [[f'0 games played on {current_year_jan_1.date() + timedelta(days=i)}' for i in j] for j in hover_text]
-
-    for i in json.loads(df.to_json(orient="records")):
-        nz[(i["day"] + (7 - first_day_ind)) % 7][i["week"] - 1] = i["total_games"]
-        hover_text[(i["day"] + (7 - first_day_ind)) % 7][i["week"] - 1] = f'{i["total_games"]} games played on {datetime.fromtimestamp(i["date"] / 1000).strftime("%a")}, {datetime.fromtimestamp(i["date"] / 1000).date()}'
-
-    fig = go.Figure(data=go.Heatmap(
-        z = nz[::-1],
-        x = x,
-        y = y[::-1],
-        xgap=4,
-        ygap=4,
-        hovertext=hover_text[::-1],
-        hovertemplate="%{hovertext}",
-        colorscale=px.colors.sequential.Greens,
-        showscale=False
-    ))
+        partner_bar_chart.update_layout(
+            plot_bgcolor="white",
+            width=300,
+            margin=dict(b=0, l=100, t=0),
+            height=player_partner_stats.shape[0] * 50
+        )
+        return partner_bar_chart
 
-    fig.update_layout(
-        width=750, 
-        height=150, 
-        margin=dict(b=0, t=0, r=0)
-    )
-    st.plotly_chart(fig)
+    utils.plotly_chart("partner_bar_chart", player_partner_stats["win_pct"], build_partner_bar_chart, container=player_partner_cols[-1])
 
-def display_player_daily_stats(player_matches: pd.DataFrame, player):
+@instrumented("display_player_daily_stats")
+def display_player_daily_stats(player_cube: pd.DataFrame, player, win_rates: pd.DataFrame):
     daily_stat_cols = st.columns([4, 2])
-    daily_performance = player_matches.groupby(["date", "result"]).agg(**{
-        "total_games": pd.NamedAgg("result", "count"), 
-        "average_ppg": pd.NamedAgg("player_team_points", "mean"),
-        **{f"{fn}_margin": pd.NamedAgg("margin", fn) for fn in ["mean", "max", "min"]}
-    })
+    daily_performance = roll_up(player_cube, ["date", "result"])
 
     daily_performance_bar_chart = px.bar(
         daily_performance.reset_index(),
@@ -186,11 +124,9 @@ def display_player_daily_stats(player_matches: pd.DataFrame, player):
 
     daily_stat_cols[0].markdown('<h6 style="margin-top: 20px">Daily Trend:</h6>', unsafe_allow_html=True)
 
-    daily_performance_res_ignored = player_matches.groupby(["date"]).agg(**{
-        "total_games": pd.NamedAgg("result", "count"), 
-        "wins": pd.NamedAgg("is_win", "sum"),
-        "average_ppg": pd.NamedAgg("player_team_points", "mean")
-    })
+    daily_performance_res_ignored = roll_up(player_cube, ["date"])[["total_games", "average_ppg"]]
+    won = player_cube.index.get_level_values("result") == "win"
+    daily_performance_res_ignored.insert(1, "wins", roll_up(player_cube[won], ["date"])["total_games"].reindex(daily_performance_res_ignored.index, fill_value=0))
     
     best_day = daily_performance_res_ignored['total_games'].idxmax()
     daily_performance_res_ignored = daily_performance_res_ignored.reset_index()
@@ -199,20 +135,51 @@ def display_player_daily_stats(player_matches: pd.DataFrame, player):
     daily_performance_res_ignored["average_ppg"] = round(daily_performance_res_ignored["average_ppg"], 2)
 
     with daily_stat_cols[0]:
-        display_player_daily_stats_heat_map(daily_performance.reset_index())
-
-    daily_performance_res_ignored["win_pct_change"] = np.cumsum(daily_performance_res_ignored["win_pct"]) / range(1, daily_performance_res_ignored.shape[0] + 1)
-
-    daily_win_pct = go.Scatter(
-        x=daily_performance_res_ignored["date"],
-        y=daily_performance_res_ignored["win_pct_change"],
-        line_color="#9ccc65",
-        fill="tozeroy"
-    )
-
-    daily_win_pct_fig = go.Figure(daily_win_pct)
-    daily_win_pct_fig.update_layout(plot_bgcolor="#f9f9ff", title="Daily win percentages")
-
-    st.plotly_chart(
-        daily_win_pct_fig
-    )
\ No newline at end of file
+        calendar_heatmap.display_calendar_heatmap(daily_performance_res_ignored['date'], daily_performance_res_ignored['total_games'], key="player_heatmap_year")
+
+    # win rates as of each day's last game, counting all the player's games up to it
+    daily_win_rates = win_rates.groupby("date").last().reset_index()
+    rolling_col = daily_win_rates.columns[2]
+
+    def build_daily_win_pct_fig():
+        daily_win_pct_fig = go.Figure([
+            go.Scatter(
+                x=daily_win_rates["date"],
+                y=daily_win_rates["cumulative_win_pct"],
+                name="overall",
+                line_color="#9ccc65",
+                fill="tozeroy"
+            ),
+            go.Scatter(
+                x=daily_win_rates["date"],
+                y=daily_win_rates[rolling_col],
+                name=rolling_col.replace("_win_pct", " games").replace("_", " "),
+                line_color="#37474f"
+            )
+        ])
+        daily_win_pct_fig.update_layout(plot_bgcolor="#f9f9ff", title="Win percentage over time")
+        return daily_win_pct_fig
+
+    utils.plotly_chart("daily_win_pct_fig", daily_win_rates, build_daily_win_pct_fig)
+
+    streak = win_rates["streak"].iloc[-1]
+    daily_stat_cols[1].metric("Streak", f"{'W' if streak > 0 else 'L'}{abs(streak)}")
+
+@instrumented("display_player_rating_history")
+def display_player_rating_history(rating_history: pd.DataFrame, player):
+    # the rating counts every game, so only the date range narrows it, not the venue
+    if rating_history.empty:
+        st.caption(f"No rated games for {player} in this period")
+        return
+
+    def build_rating_history_fig():
+        rating_history_fig = go.Figure(go.Scatter(
+            x=rating_history["timestamp"],
+            y=rating_history["rating"],
+            line_color="#37474f",
+            hovertemplate="%{x|%Y-%m-%d}: %{y:.0f}<extra></extra>"
+        ))
+        rating_history_fig.update_layout(plot_bgcolor="#f9f9ff", title=f"{player}'s rating, now {rating_history['rating'].iloc[-1]:.0f}")
+        return rating_history_fig
+
+    utils.plotly_chart("rating_history_fig", rating_history, build_rating_history_fig, player=player)
@@ -5,39 +5,37 @@ import pandas as pd
 import numpy as np
 from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode, AgGridTheme, JsCode
 import utils
+from instrumentation import instrumented
+from engine.leaderboard import compute_leaderboard
+from engine.ratings import EloRatings
+from engine.rolling import RollingStats
 
 
-def display_leaderboard(df, players_list):
+@instrumented("display_leaderboard")
+def display_leaderboard(player_games, players_list, ratings: EloRatings, rolling: RollingStats):
     leaderboard_cols = st.columns([8, 3])
 
-    leaderboard = []
-
-    for player in players_list:
-        player_stats = utils.get_player_stats(player, df)
-        
-        total_games, wins = player_stats.shape[0], player_stats['is_win'].sum()
-        leaderboard.append({
-            "player": player,
-            "total_games": total_games,
-            "wins": wins,
-            "wins_pct": round(wins * 100 / total_games, 2),
-            "form": ' '.join(player_stats.iloc[-5:, :]['result'].apply(lambda x: x[0].upper()).to_list())[::-1]
-        })
-
-    leaderboard_df = pd.DataFrame(leaderboard).sort_values("wins_pct", ascending=False)
+    # ranked by rating, which accounts for the strength of partners and opponents
+    leaderboard_df = compute_leaderboard(player_games, players_list, rolling)
+    leaderboard_df.insert(1, "rating", leaderboard_df["player"].map(ratings.table().set_index("player")["rating"]))
+    leaderboard_df = leaderboard_df.sort_values("rating", ascending=False)
     leaderboard_df = leaderboard_df[leaderboard_df['total_games'] > 25]
     leaderboard_df = leaderboard_df[leaderboard_df['player'] != 'other']
     leaderboard_df['player'] = leaderboard_df['player'].str.capitalize()
-    leader = leaderboard_df.sort_values('wins_pct', ascending=False).iloc[0, 0]
+    leader = leaderboard_df.iloc[0, 0]
 
-    builder = GridOptionsBuilder.from_dataframe(leaderboard_df)
+    def build_grid_options():
+        builder = GridOptionsBuilder.from_dataframe(leaderboard_df)
 
-    builder.configure_columns(leaderboard_df.columns, width=140)
-    builder.configure_column('player', width=140)
-    builder.configure_column('total_games', width=180)
+        builder.configure_columns(leaderboard_df.columns, width=140)
+        builder.configure_column('player', width=140)
+        builder.configure_column('total_games', width=180)
 
-    grid_options = builder.build()
-    grid_options['getRowStyle'] = utils.get_js_code_for_row_color('player', leader)
+        grid_options = builder.build()
+        grid_options['getRowStyle'] = utils.get_js_code_for_row_color('player', leader)
+        return grid_options
+
+    grid_options = utils.grid_options("leaderboard", leaderboard_df, build_grid_options, leader=leader)
 
     with leaderboard_cols[0]:
         leader_board = AgGrid(
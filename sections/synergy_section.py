@@ -0,0 +1,42 @@
+import streamlit as st
+import plotly.graph_objects as go
+import pandas as pd
+import utils
+from instrumentation import instrumented
+from engine.synergy import PartnerSynergy
+
+@instrumented("display_synergy_heatmap")
+def display_synergy_heatmap(synergy: PartnerSynergy, players_list, min_games=10):
+    # regulars only, as on the leaderboard; pairs with fewer than min_games stay blank
+    games_played = pd.Series(synergy.games.sum(axis=1), index=synergy.players)
+    players = [player for player in players_list if player != "other" and games_played.get(player, 0) > 25]
+    if not players:
+        st.caption("Not enough games yet for partner synergy")
+        return
+
+    win_pct = synergy.win_pct_matrix(players, min_games)
+    games = pd.DataFrame(synergy.games, index=synergy.players, columns=synergy.players).loc[players, players]
+    labels = [player.capitalize() for player in players]
+
+    def build_synergy_heatmap():
+        synergy_heatmap = go.Figure(go.Heatmap(
+            z=win_pct.to_numpy(),
+            x=labels,
+            y=labels,
+            customdata=games.to_numpy(),
+            colorscale=[[0, "#37474f"], [0.5, "#f9f9ff"], [1, "#9ccc65"]],
+            zmin=0,
+            zmax=100,
+            hoverongaps=False,
+            hovertemplate="%{y} & %{x}<br>Win Percentage: %{z} %<br>Games: %{customdata}<extra></extra>"
+        ))
+        synergy_heatmap.update_layout(
+            plot_bgcolor="white",
+            title=f"Win percentage of each pair (at least {min_games} games together)",
+            height=max(400, len(players) * 30),
+            yaxis_autorange="reversed"
+        )
+        return synergy_heatmap
+
+    # the hover shows the game counts too, so they are part of what the figure is keyed on
+    utils.plotly_chart("synergy_heatmap", pd.concat({"win_pct": win_pct, "games": games}, axis=1), build_synergy_heatmap, min_games=min_games)
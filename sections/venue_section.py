@@ -2,70 +2,69 @@ import streamlit as st
 import plotly.express as px
 import pandas as pd
 import utils
+from instrumentation import instrumented
 import numpy as np
 from st_aggrid import AgGrid, GridOptionsBuilder, AgGridTheme
+from engine.cube import AggregateCube, roll_up
 
-def display_venue_stats(df: pd.DataFrame):
+@instrumented("display_venue_stats")
+def display_venue_stats(cube: AggregateCube):
 
     venue_cols = st.columns([3, 2])
-    venue_bar_chart = px.bar(
-        df.groupby(["point_bins", "venue"]).agg(**{
-            "total_games": pd.NamedAgg("date", "count")
-        }).reset_index(),
-        x="venue",
-        y="total_games",
-        color="point_bins",
-        template="plotly_white",
-        color_discrete_sequence=px.colors.sequential.Viridis_r,
-        title="Total Games played at different venues",
-        width=600
-    )
+    venue_stats_df = roll_up(cube.games, ["venue"])
+    games_by_bin_df = roll_up(cube.games, ["point_bins", "venue"])[["total_games"]].reset_index()
 
-    venue_bar_chart.update_traces(showlegend=False)
+    def build_venue_bar_chart():
+        venue_bar_chart = px.bar(
+            games_by_bin_df,
+            x="venue",
+            y="total_games",
+            color="point_bins",
+            template="plotly_white",
+            color_discrete_sequence=px.colors.sequential.Viridis_r,
+            title="Total Games played at different venues",
+            width=600
+        )
+        venue_bar_chart.update_traces(showlegend=False)
+        return venue_bar_chart
 
-    venue_cols[0].plotly_chart(
-        venue_bar_chart
-    )
+    utils.plotly_chart("venue_bar_chart", games_by_bin_df, build_venue_bar_chart, container=venue_cols[0])
 
-    venue_pie_fig = px.pie(
-        df.groupby(["venue"]).agg(**{
-            "total_games": pd.NamedAgg("date", "count")
-        }).reset_index(),
-        values="total_games",
-        names="venue",
-        color_discrete_sequence=px.colors.sequential.Viridis_r,
-        hole=0.3,
-        title="Venue Most Visited",
-        width=350
-    )
-    venue_pie_fig.update_traces(
-        textposition='inside',
-        showlegend=False,
-        pull=0.05
-    )
-    venue_pie_fig.update_layout(margin=dict(l=100), title=dict(xanchor="center"))
+    def build_venue_pie_fig():
+        venue_pie_fig = px.pie(
+            venue_stats_df[["total_games"]].reset_index(),
+            values="total_games",
+            names="venue",
+            color_discrete_sequence=px.colors.sequential.Viridis_r,
+            hole=0.3,
+            title="Venue Most Visited",
+            width=350
+        )
+        venue_pie_fig.update_traces(
+            textposition='inside',
+            showlegend=False,
+            pull=0.05
+        )
+        venue_pie_fig.update_layout(margin=dict(l=100), title=dict(xanchor="center"))
+        return venue_pie_fig
 
-    venue_cols[1].plotly_chart(
-        venue_pie_fig
-    )
+    utils.plotly_chart("venue_pie_fig", venue_stats_df["total_games"], build_venue_pie_fig, container=venue_cols[1])
 
     st.markdown("<h6 style='margin-top:50px'>Overall Venue stats</h6>", unsafe_allow_html=True)
 
     with st.columns([9, 1])[0]:
-        venue_stats_df = df.groupby("venue").agg(**{
-            "total_games": pd.NamedAgg("date", "count"), 
-            "average_ppg": pd.NamedAgg("total_points_per_game", "mean"),
-            **{f"{fn}_margin": pd.NamedAgg("margin", fn) for fn in ["mean", "max", "min"]}
-        })
-
         venue_most_visited = venue_stats_df["total_games"].idxmax()
 
         venue_stats_df = venue_stats_df.reset_index().round(decimals=2)
 
-        builder = GridOptionsBuilder.from_dataframe(venue_stats_df)
+        def build_grid_options():
+            builder = GridOptionsBuilder.from_dataframe(venue_stats_df)
+
+            grid_options = builder.build()
+            grid_options['getRowStyle'] = utils.get_js_code_for_row_color('venue', venue_most_visited)
+            return grid_options
 
-        grid_options = builder.build()
-        grid_options['getRowStyle'] = utils.get_js_code_for_row_color('venue', venue_most_visited)
+        grid_options = utils.grid_options("venue_stats", venue_stats_df, build_grid_options, venue_most_visited=venue_most_visited)
 
         leader_board = AgGrid(
             venue_stats_df, 
@@ -0,0 +1,160 @@
+import argparse
+from contextlib import contextmanager
+import json
+import sqlite3
+import pandas as pd
+from instrumentation import instrumented, timed
+
+
+class StorageBackend:
+    # What the app needs from wherever the workbook lives. Worksheets are tables with
+    # a header row; values come back numericised the way get_all_records() does it.
+
+    def get_sheet_data(self, workbook_name, worksheet_name):
+        raise NotImplementedError
+
+    def get_sheets_data(self, workbook_name, worksheet_names):
+        # {name: frame} for the worksheets that exist
+        frames = {}
+        for name in worksheet_names:
+            try:
+                frames[name] = self.get_sheet_data(workbook_name, name)
+            except KeyError:
+                pass
+        return frames
+
+    def get_sheet_rows(self, workbook_name, worksheet_name, start_row=0):
+        # data rows from `start_row` (0 based, header excluded) to the end of the sheet
+        return self.get_sheet_data(workbook_name, worksheet_name).iloc[start_row:]
+
+    def get_fingerprints(self, workbook_name, worksheet_names):
+        # {name: value} that changes whenever the worksheet does, fetched without reading
+        # the worksheet; a worksheet left out has to be read to find out
+        return {}
+
+    def append_rows(self, workbook_name, worksheet_name, rows):
+        raise NotImplementedError
+
+    def add_expense(self, workbook_name, worksheet_name, expense_details):
+        self.append_rows(workbook_name, worksheet_name, [expense_details])
+
+    def add_settlement(self, workbook_name, worksheet_name, expense_details):
+        self.append_rows(workbook_name, worksheet_name, [expense_details])
+
+    def get_stats(self):
+        return {}
+
+
+class SqliteBackend(StorageBackend):
+    # The workbook as a local SQLite file, one table per worksheet kept in row order.
+    # Columns are untyped, so ints, floats and text round trip as they were written.
+    # _revisions counts the writes to each worksheet, which is its fingerprint.
+
+    def __init__(self, path, worksheet_columns=None):
+        # `worksheet_columns` names the columns of worksheets created by append_rows
+        self.path = path
+        self.worksheet_columns = worksheet_columns or {}
+
+    @contextmanager
+    def _connect(self):
+        # one short lived connection per call, so any thread can use the backend
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def _columns(self, connection, worksheet_name):
+        columns = [row[1] for row in connection.execute(f"PRAGMA table_info({quote(worksheet_name)})")]
+        if not columns:
+            raise KeyError(worksheet_name)
+        return columns
+
+    def _bump_revision(self, connection, worksheet_name):
+        connection.execute("CREATE TABLE IF NOT EXISTS _revisions (worksheet TEXT PRIMARY KEY, revision INTEGER NOT NULL)")
+        connection.execute(
+            "INSERT INTO _revisions VALUES (?, 1) ON CONFLICT (worksheet) DO UPDATE SET revision = revision + 1", (worksheet_name,)
+        )
+
+    @instrumented("sqlite.get_sheet_data")
+    def get_sheet_data(self, workbook_name, worksheet_name):
+        return self.get_sheet_rows(workbook_name, worksheet_name)
+
+    @instrumented("sqlite.get_sheet_rows")
+    def get_sheet_rows(self, workbook_name, worksheet_name, start_row=0):
+        with self._connect() as connection:
+            columns = self._columns(connection, worksheet_name)
+            rows = connection.execute(
+                f"SELECT * FROM {quote(worksheet_name)} ORDER BY rowid LIMIT -1 OFFSET ?", (start_row,)
+            ).fetchall()
+        df = pd.DataFrame(rows, columns=columns)
+        df.index += start_row
+        return df
+
+    @instrumented("sqlite.get_fingerprints")
+    def get_fingerprints(self, workbook_name, worksheet_names):
+        # the write counts; worksheets written before they were kept are left out
+        with self._connect() as connection:
+            try:
+                revisions = dict(connection.execute(
+                    f"SELECT worksheet, revision FROM _revisions WHERE worksheet IN ({', '.join('?' * len(worksheet_names))})",
+                    list(worksheet_names)
+                ))
+            except sqlite3.OperationalError:
+                return {}
+        return revisions
+
+    def append_rows(self, workbook_name, worksheet_name, rows):
+        if not rows:
+            return
+        width = max(len(row) for row in rows)
+        with timed("sqlite.append_rows", worksheet=worksheet_name, rows=len(rows)), self._connect() as connection:
+            try:
+                columns = self._columns(connection, worksheet_name)
+            except KeyError:
+                columns = list(self.worksheet_columns.get(worksheet_name, []))
+                columns += [f"column_{i + 1}" for i in range(len(columns), width)]
+                connection.execute(f"CREATE TABLE {quote(worksheet_name)} ({', '.join(map(quote, columns))})")
+
+            # short rows are padded with empty cells like a sheet would
+            rows = [list(row) + [""] * (len(columns) - len(row)) for row in rows]
+            connection.executemany(
+                f"INSERT INTO {quote(worksheet_name)} VALUES ({', '.join('?' * len(columns))})", rows
+            )
+            self._bump_revision(connection, worksheet_name)
+
+    def write_sheet(self, worksheet_name, df: pd.DataFrame):
+        # replace a worksheet with the contents of `df`
+        with self._connect() as connection:
+            connection.execute(f"DROP TABLE IF EXISTS {quote(worksheet_name)}")
+            connection.execute(f"CREATE TABLE {quote(worksheet_name)} ({', '.join(map(quote, df.columns))})")
+            connection.executemany(
+                f"INSERT INTO {quote(worksheet_name)} VALUES ({', '.join('?' * df.shape[1])})",
+                df.astype(object).itertuples(index=False, name=None)
+            )
+            self._bump_revision(connection, worksheet_name)
+
+
+def quote(identifier):
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+
+if __name__ == "__main__":
+    # copy worksheets from Google Sheets into a local SQLite file for STREAMLIT_APP_MODE=local
+    from fetch_sheets_data import Gsheet
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("config_file", help="service account json")
+    parser.add_argument("output", help="sqlite file to write")
+    parser.add_argument("--workbook", default="badminton_tracking")
+    parser.add_argument("--worksheets", nargs="+", default=["Form Responses 1", "expense_tracker", "shuttle_expense_tracker", "settlements"])
+    args = parser.parse_args()
+
+    with open(args.config_file) as f:
+        frames = Gsheet(json.load(f)).get_sheets_data(args.workbook, args.worksheets)
+
+    backend = SqliteBackend(args.output)
+    for name, df in frames.items():
+        backend.write_sheet(name, df)
+        print(f"{name}: {df.shape[0]} rows")
@@ -3,7 +3,28 @@ import plotly.express as px
 import pandas as pd
 import numpy as np
 import os
+import threading
+import uuid
 from fetch_sheets_data import Gsheet
+from storage_backend import SqliteBackend
+from data_cache import DataCache
+from match_snapshot import MatchSnapshot
+from write_journal import WriteJournal
+from dataset_store import DatasetStore
+from background_refresher import BackgroundRefresher
+from rate_limiter import priority, BACKGROUND
+from instrumentation import instrumented, start_run, timed
+from engine.player_games import build_player_games, PLAYER_COLUMNS
+from engine.match_index import MatchIndex
+from engine import head_to_head
+from engine.heatmap import build_calendar_heatmap
+from engine.attendance import Attendance
+from engine.cube import AggregateCube
+from engine.ratings import EloRatings
+from engine.rolling import RollingStats
+from engine.synergy import PartnerSynergy
+from render_cache import RenderCache, content_hash
+import copy
 import json
 import plotly.graph_objects as go
 from st_aggrid import JsCode
@@ -16,83 +37,330 @@ AGGRID_TABLE_STYLES = {
     ".ag-root": {"font-family": "Monospace"}
 }
 
+WORKBOOK_NAME = "badminton_tracking"
 
-def get_player_stats(player, df: pd.DataFrame):
-    player_matches = df[
-        np.where(
-            np.logical_or.reduce([df[i] == player for i in ["team_1_player_1", "team_1_player_2", "team_2_player_1", "team_2_player_2"]]),
-            True,
-            False
-        )
-    ].copy()
-    
-    player_matches["belongs_to"] = np.where(
-        np.logical_or(
-            *[player_matches[i] == player for i in ["team_1_player_1", "team_1_player_2"]]
-        ),
-        'team_1',
-        'team_2'
-    )
-    
-    player_matches['player_team_points'] = np.where(
-        player_matches["belongs_to"] == 'team_1',
-        player_matches["points_team_1"],
-        player_matches["points_team_2"]
-    )
-    
-    player_matches['result'] = np.where(player_matches.belongs_to == player_matches.winner, "win", "loss")
-    player_matches['is_win'] = np.where(player_matches.result == "win", 1, 0)
-    
-    return player_matches
+MATCH_WORKSHEET_NAME = "Form Responses 1"
 
-def get_gsheet():
-    if os.environ["STREAMLIT_APP_MODE"] == "test":
-        with open(os.environ['CONFIG_FILE_PATH']) as f:
-            return Gsheet(json.load(f))
+# every worksheet the app reads, "matches" being the match worksheet
+SHEET_KEYS = ["matches", "expense_tracker", "shuttle_expense_tracker", "settlements"]
+
+# columns of the worksheets the app appends to, used when a local backend has to create one
+WORKSHEET_COLUMNS = {
+    "expense_tracker": ["date", "amount", "paid_by"],
+    "shuttle_expense_tracker": ["expense_id", "record_date", "paid_by", "amount", "shared_by", "comments"],
+    "settlements": ["date", "paid_by", "paid_to", "amount"],
+}
+
+# requests the Sheets clients may make, sized to the per-minute quota of the service account
+SHEETS_QUOTA = {
+    "requests_per_minute": float(os.environ.get("SHEETS_REQUESTS_PER_MINUTE", 60)),
+    "burst": int(os.environ.get("SHEETS_REQUEST_BURST", 10))
+}
+
+sheet_cache = DataCache(
+    ttl=float(os.environ.get("DATA_CACHE_TTL", 600)),
+    fingerprint=lambda keys: get_sheet_fingerprints(keys)
+)
+match_snapshot = MatchSnapshot(os.environ.get("MATCH_SNAPSHOT_DIR", ".snapshots"))
+_backend = None
+_backend_lock = threading.Lock()
+write_journal = WriteJournal(
+    os.environ.get("WRITE_JOURNAL_PATH", os.path.join(".journal", "pending_writes.jsonl")),
+    flush=lambda worksheet_name, rows: flush_journal_rows(worksheet_name, rows),
+    on_flushed=sheet_cache.invalidate
+)
+write_journal.start()
+background_refresher = BackgroundRefresher(
+    lambda: refresh_sheet_data(),
+    interval=float(os.environ.get("BACKGROUND_REFRESH_INTERVAL", 60))
+)
+dataset_store = DatasetStore(os.environ.get("DATASET_DIR", ".dataset"))
+render_cache = RenderCache(max_bytes=int(os.environ.get("RENDER_CACHE_MB", 64)) * 2**20)
+
+
+def get_player_stats(player, df: pd.DataFrame, player_games: pd.DataFrame, player_game_rows=None):
+    if player_game_rows is None:
+        player_rows = player_games[player_games["player"] == player]
     else:
-        return Gsheet(st.secrets['gsheet_configs'])
-    
+        player_rows = player_games.take(player_game_rows)
+    player_matches = df.take(player_rows["game"].to_numpy())
+
+    player_matches["belongs_to"] = player_rows["team"].to_numpy()
+    player_matches["partner"] = player_rows["partner"].to_numpy()
+    player_matches['player_team_points'] = player_rows["points_for"].to_numpy()
+    player_matches['result'] = player_rows["result"].to_numpy()
+    player_matches['is_win'] = player_rows["is_win"].to_numpy()
+
+    return player_matches
+
+def get_backend():
+    # one storage backend for the whole process, shared by every session and rerun
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if os.environ["STREAMLIT_APP_MODE"] == "local":
+                _backend = SqliteBackend(os.environ.get("LOCAL_DATA_PATH", "local_data.sqlite"), WORKSHEET_COLUMNS)
+            elif os.environ["STREAMLIT_APP_MODE"] == "test":
+                with open(os.environ['CONFIG_FILE_PATH']) as f:
+                    _backend = Gsheet(json.load(f), **SHEETS_QUOTA)
+            else:
+                _backend = Gsheet(st.secrets['gsheet_configs'], **SHEETS_QUOTA)
+        return _backend
+
 def add_expense_data(expense_data):
-    get_gsheet().add_expense("badminton_tracking", "expense_tracker", expense_data)
+    write_journal.submit("expense_tracker", expense_data)
 
 def add_shuttle_expense_data(data:list):
-    gsheet = get_gsheet()
-    expense_id = 0
-    try:
-        expense_id = gsheet.get_sheet_data("badminton_tracking", "shuttle_expense_tracker")['expense_id'].to_list()[-1] + 1
-    except:
-        expense_id = 1
-    data.insert(0, expense_id)
-    get_gsheet().add_expense("badminton_tracking", "shuttle_expense_tracker", data)
+    # a random id rather than the next number, which every server process would work
+    # out for itself; 53 bits so the sheet keeps it exact
+    data.insert(0, uuid.uuid4().int >> 75)
+    write_journal.submit("shuttle_expense_tracker", data)
 
 def add_settlement_data(settlement_data):
-    get_gsheet().add_expense("badminton_tracking", "settlements", settlement_data)
+    write_journal.submit("settlements", settlement_data)
+
+def flush_journal_rows(worksheet_name, rows):
+    with priority(BACKGROUND):
+        get_backend().append_rows(WORKBOOK_NAME, worksheet_name, rows)
+
+def read_worksheet(worksheet_name):
+    # a worksheet nobody has written to yet reads as empty
+    try:
+        return get_backend().get_sheet_data(WORKBOOK_NAME, worksheet_name)
+    except KeyError:
+        return pd.DataFrame()
+
+def get_cached_sheet_data(worksheet_name):
+    return sheet_cache.get(worksheet_name, lambda: read_worksheet(worksheet_name))
+
+def get_sheet_fingerprints(keys):
+    # cache keys are worksheet names, "matches" stands for the match worksheet;
+    # derived values (tuple keys) have no fingerprint of their own
+    worksheet_names = {key: MATCH_WORKSHEET_NAME if key == "matches" else key for key in keys if isinstance(key, str)}
+    if not worksheet_names:
+        return {}
+    fingerprints = get_backend().get_fingerprints(WORKBOOK_NAME, list(worksheet_names.values()))
+    return {key: fingerprints.get(name) for key, name in worksheet_names.items()}
+
+def with_pending_rows(worksheet_name, df: pd.DataFrame):
+    # submissions still queued for the sheet show up right away, under the known
+    # headers when the worksheet is still empty (or doesn't exist yet)
+    rows = write_journal.pending(worksheet_name)
+    columns = df.columns if df.shape[1] else pd.Index(WORKSHEET_COLUMNS.get(worksheet_name, []))
+    if not rows or len(columns) < max(len(row) for row in rows):
+        return df if df.shape[1] else pd.DataFrame(columns=columns)
+    pending_df = pd.DataFrame(rows, columns=columns[:max(len(row) for row in rows)])
+    return pending_df if df.shape[1] == 0 else pd.concat([df, pending_df], ignore_index=True)
+
+def load_shared(keys, batch_loader):
+    # frames another process already published for the sheets as they are now are
+    # mapped instead of loaded, what is loaded here is published for the others. The
+    # fingerprints are the ones the sheet cache took just before calling us (stored
+    # as JSON, hence the round trip); keys without one are loaded and published bare
+    fingerprints = {key: json.loads(json.dumps(value)) for key, value in sheet_cache.loading_fingerprints(keys).items()}
+
+    frames = {}
+    for key in keys:
+        if fingerprints.get(key) is not None and dataset_store.fingerprint(key) == fingerprints[key]:
+            df = dataset_store.read(key)
+            if df is not None:
+                frames[key] = df
+
+    missing_keys = [key for key in keys if key not in frames]
+    if missing_keys:
+        for key, df in batch_loader(missing_keys).items():
+            # hand out the mapped copy so this process doesn't keep a private one
+            shared = dataset_store.read(key) if dataset_store.publish(key, df, fingerprints.get(key)) else None
+            frames[key] = df if shared is None else shared
+    return frames
+
+def load_sheets(keys):
+    return load_shared(keys, fetch_sheets)
+
+def fetch_sheets(keys):
+    # {key: frame} for the listed cache keys that exist, with one batched request
+    worksheet_names = {key: MATCH_WORKSHEET_NAME if key == "matches" else key for key in keys}
+    frames = get_backend().get_sheets_data(WORKBOOK_NAME, list(worksheet_names.values()))
+    return {
+        key: normalize_match_data(frames[name]) if key == "matches" else frames[name]
+        for key, name in worksheet_names.items() if name in frames
+    }
+
+@instrumented("prefetch_sheet_data")
+def prefetch_sheet_data(keys):
+    # load every listed sheet that isn't cached yet with one batched request
+    if os.environ.get("MATCH_SYNC_MODE") == "snapshot":
+        keys = [key for key in keys if key != "matches"]
+    sheet_cache.get_many(keys, load_sheets)
+
+def start_background_refresh():
+    # once running, sessions are served whatever is cached however old and the
+    # refresher keeps it current; BACKGROUND_REFRESH_INTERVAL=0 turns it off
+    if background_refresher.interval > 0 and not background_refresher.is_running():
+        sheet_cache.serve_stale = True
+        background_refresher.start()
+
+def refresh_sheet_data():
+    start_run("background_refresh")
+    with timed("refresh_sheet_data"), priority(BACKGROUND):
+        if os.environ.get("MATCH_SYNC_MODE") == "snapshot":
+            sheet_cache.refresh(["matches"], lambda keys: {"matches": get_match_loader()()})
+            sheet_cache.refresh([key for key in SHEET_KEYS if key != "matches"], load_sheets)
+        else:
+            sheet_cache.refresh(SHEET_KEYS, load_sheets)
+
+        # build what the pages derive from the matches here, not in someone's rerun
+        get_player_games()
+        get_attendance()
+        get_aggregate_cube()
+        get_ratings()
+        get_rolling_stats()
+        get_partner_synergy()
+        get_match_index()
+        get_matchups()
+
+def get_data_as_of():
+    return sheet_cache.checked_at(SHEET_KEYS)
 
+@instrumented("get_expenses_data")
 def get_expenses_data():
-    gsheet = get_gsheet()
-    return gsheet.get_sheet_data("badminton_tracking", "expense_tracker")
+    return with_pending_rows("expense_tracker", get_cached_sheet_data("expense_tracker"))
 
+@instrumented("get_shuttle_expenses_data")
 def get_shuttle_expenses_data():
-    gsheet = get_gsheet()
-    return gsheet.get_sheet_data("badminton_tracking", "shuttle_expense_tracker")
+    return with_pending_rows("shuttle_expense_tracker", get_cached_sheet_data("shuttle_expense_tracker"))
 
+@instrumented("get_settlements_data")
 def get_settlements_data():
-    gsheet = get_gsheet()
-    return gsheet.get_sheet_data("badminton_tracking", "settlements").set_index('date').reset_index()
+    return with_pending_rows("settlements", get_cached_sheet_data("settlements")).set_index('date').reset_index()
 
+@instrumented("get_data")
 def get_data():
-    gsheet = get_gsheet()
-    df = gsheet.get_sheet_data("badminton_tracking", "Form Responses 1").drop(["result"], axis=1)
+    return sheet_cache.get("matches", get_match_loader())
 
-    df.columns = ["timestamp", "date", "team_1_player_1", "team_1_player_2", "team_2_player_1", "team_2_player_2", "points_team_1", "points_team_2", "venue"]
+@instrumented("get_player_games")
+def get_player_games():
+    return sheet_cache.get_derived("player_games", "matches", get_match_loader(), build_player_games)
 
-    df['winner'] = np.where(df.points_team_1 > df.points_team_2, 'team_1', 'team_2')
-    df['margin'] = abs(df.points_team_1 - df.points_team_2)
+def player_games_of(df: pd.DataFrame):
+    # for builders of other derived values, so both come from the same matches frame
+    return sheet_cache.derived_from("player_games", "matches", df, build_player_games)
+
+@instrumented("get_attendance")
+def get_attendance():
+    return sheet_cache.get_derived("attendance", "matches", get_match_loader(), Attendance)
+
+def get_match_derived(name, df, builder, updater=None):
+    # a page that already holds the match frame passes it as `df`, so every value it
+    # shows is built from that same version instead of whatever is cached by then
+    if df is None:
+        return sheet_cache.get_derived(name, "matches", get_match_loader(), builder, updater)
+    return sheet_cache.derived_from(name, "matches", df, builder, updater)
+
+@instrumented("get_aggregate_cube")
+def get_aggregate_cube(df: pd.DataFrame = None):
+    return get_match_derived("aggregate_cube", df, AggregateCube.build, lambda cube, df: cube.update(df))
+
+@instrumented("get_ratings")
+def get_ratings(df: pd.DataFrame = None):
+    return get_match_derived("ratings", df, build_ratings, update_ratings)
+
+def build_ratings(df: pd.DataFrame):
+    # pick up from the checkpoint next to the match snapshot, update() replays
+    # everything when the checkpoint doesn't match the data
+    return update_ratings(EloRatings.load(get_ratings_checkpoint_path()) or EloRatings(), df)
+
+def update_ratings(ratings: EloRatings, df: pd.DataFrame):
+    updated = ratings.update(df)
+    if updated is not ratings:
+        os.makedirs(match_snapshot.directory, exist_ok=True)
+        updated.save(get_ratings_checkpoint_path())
+    return updated
+
+def get_ratings_checkpoint_path():
+    return os.path.join(match_snapshot.directory, "ratings.npz")
+
+@instrumented("get_rolling_stats")
+def get_rolling_stats(df: pd.DataFrame = None):
+    return get_match_derived("rolling_stats", df, lambda df: RollingStats(player_games_of(df)))
+
+@instrumented("get_partner_synergy")
+def get_partner_synergy(df: pd.DataFrame = None):
+    return get_match_derived("partner_synergy", df, lambda df: PartnerSynergy(player_games_of(df)))
+
+@instrumented("get_match_index")
+def get_match_index(df: pd.DataFrame = None):
+    return get_match_derived("match_index", df, lambda df: MatchIndex(df, player_games_of(df)))
+
+@instrumented("get_matchups")
+def get_matchups(df: pd.DataFrame = None):
+    return get_match_derived("matchups", df, head_to_head.build_matchups, head_to_head.update_matchups)
+
+def get_matchup(team_1, team_2, df: pd.DataFrame = None):
+    # the game positions in the result are rows of `df` (of the current frame without it)
+    return head_to_head.get_matchup(get_matchups(df), team_1, team_2)
+
+def get_rivalries(min_games=5, df: pd.DataFrame = None):
+    return head_to_head.rank_rivalries(get_matchups(df), min_games)
+
+def get_match_loader():
+    # a snapshot sync only reads the new rows into a snapshot the server processes
+    # already share, republishing the whole frame after each one would undo that
+    if os.environ.get("MATCH_SYNC_MODE") == "snapshot":
+        return sync_match_data
+    return lambda: load_shared(["matches"], lambda keys: {"matches": load_match_data()})["matches"]
+
+@instrumented("load_match_data")
+def load_match_data():
+    return normalize_match_data(get_backend().get_sheet_data(WORKBOOK_NAME, MATCH_WORKSHEET_NAME))
+
+@instrumented("sync_match_data")
+def sync_match_data():
+    # under the snapshot's lock, so another server process syncing the same directory
+    # waits and then starts from the rows this one added
+    with match_snapshot.locked():
+        df, meta = match_snapshot.load()
+        synced_rows = meta["synced_rows"]
+
+        # re-read the last synced row to make sure the sheet was only appended to
+        overlap = 1 if synced_rows > 0 else 0
+        new_rows = get_backend().get_sheet_rows(WORKBOOK_NAME, MATCH_WORKSHEET_NAME, synced_rows - overlap)
+
+        if overlap and (new_rows.empty or f'{new_rows.iloc[0, 0]}' != meta["last_raw_timestamp"]):
+            match_snapshot.clear()
+            return sync_match_data()
+
+        new_rows = new_rows.iloc[overlap:]
+        if new_rows.empty:
+            return df if df is not None else normalize_match_data(new_rows)
+
+        return match_snapshot.append(
+            normalize_match_data(new_rows),
+            synced_rows + new_rows.shape[0],
+            f'{new_rows.iloc[-1, 0]}'
+        )
+
+@instrumented("normalize_match_data")
+def normalize_match_data(df: pd.DataFrame):
+    df = df.drop(["result"], axis=1)
+
+    df.columns = ["timestamp", "date", *PLAYER_COLUMNS, "points_team_1", "points_team_2", "venue"]
+    games = df.shape[0]
+
+    # the four player columns share one set of categories so they stay comparable
+    players = normalized_categorical(np.concatenate([df[col].to_numpy(dtype=object) for col in PLAYER_COLUMNS]))
+    for i, col in enumerate(PLAYER_COLUMNS):
+        df[col] = players[i * games:(i + 1) * games]
+    df['venue'] = normalized_categorical(df['venue'].to_numpy(dtype=object))
+
+    df['points_team_1'] = pd.to_numeric(df['points_team_1']).astype(np.int16)
+    df['points_team_2'] = pd.to_numeric(df['points_team_2']).astype(np.int16)
+    df['winner'] = pd.Categorical.from_codes(np.where(df.points_team_1 > df.points_team_2, 0, 1), categories=['team_1', 'team_2'])
+    df['margin'] = (df.points_team_1 - df.points_team_2).abs()
     df['total_points_per_game'] = df["points_team_1"] + df["points_team_2"]
-    df['date'] = pd.to_datetime(df['date']).dt.strftime("%Y-%m-%d")
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df['date'] = parse_datetimes(df['date'])
+    df['timestamp'] = parse_datetimes(df['timestamp'])
 
-    df = df.applymap(lambda x: f'{x}'.lower().strip() if isinstance(x, str) else x)
     df['point_bins'] = pd.cut(
         df['total_points_per_game'],
         [0, 30, 35, 40, 45, float("inf")],
@@ -102,6 +370,20 @@ def get_data():
 
     return df.sort_values("timestamp")
 
+def normalized_categorical(values: np.ndarray):
+    # lowercase/strip each distinct value once instead of every cell
+    codes, uniques = pd.factorize(values)
+    names = pd.Index(uniques).astype(str).str.lower().str.strip()
+    categories = np.unique(names.to_numpy())
+    name_codes = np.searchsorted(categories, names.to_numpy())
+    return pd.Categorical.from_codes(np.where(codes < 0, -1, name_codes[codes]), categories=categories)
+
+def parse_datetimes(values: pd.Series):
+    # the date column only has a few hundred distinct values, parse each of them once
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(pd.Index(uniques), infer_datetime_format=True)
+    return pd.Series(parsed.take(codes, allow_fill=True, fill_value=pd.NaT), index=values.index)
+
 def create_go_table_figure(df):
     go_table = go.Table(
         header=dict(
@@ -122,6 +404,43 @@ def create_go_table_figure(df):
     fig.update_layout(margin=dict(t=0, b=0))
     return fig
 
+def create_calendar_heatmap_figure(dates, counts, start_date=None, end_date=None):
+    heatmap = build_calendar_heatmap(dates, counts, start_date, end_date)
+
+    fig = go.Figure(data=go.Heatmap(
+        z=heatmap["z"][::-1],
+        x=heatmap["x"],
+        y=heatmap["y"][::-1],
+        xgap=4,
+        ygap=4,
+        hovertext=heatmap["hovertext"][::-1],
+        hovertemplate="%{hovertext}<extra></extra>",
+        colorscale=px.colors.sequential.Greens,
+        showscale=False
+    ))
+
+    fig.update_layout(
+        width=max(750, heatmap["z"].shape[1] * 15),
+        height=150,
+        margin=dict(b=0, t=0, r=0),
+        plot_bgcolor="white"
+    )
+    return fig
+
+def plotly_chart(name, data, build_figure, container=None, **params):
+    # the figure is cached by a hash of the data it's drawn from and the display params,
+    # so an unchanged chart isn't rebuilt; its size is taken to be that of the data plus
+    # a few KB of layout rather than measured by serializing it
+    key = ("figure", name, content_hash(data, params))
+    size = 4096 + (0 if data is None else int(np.sum(data.memory_usage(deep=True))))
+    figure = render_cache.get(key, build_figure, size=lambda figure: size)
+    (st if container is None else container).plotly_chart(figure)
+
+def grid_options(name, data, build_options, **params):
+    # AgGrid rewrites the options it's given, so every caller gets its own copy
+    key = ("grid", name, content_hash(data, params))
+    return copy.deepcopy(render_cache.get(key, build_options, size=lambda options: len(repr(options))))
+
 def get_js_code_for_row_color(field, value):
     js_code = """
     function(params) {
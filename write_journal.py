@@ -0,0 +1,169 @@
+import fcntl
+import glob
+import json
+import os
+import random
+import threading
+import time
+
+
+class WriteJournal:
+    # Write-behind queue for sheet appends. Submissions are fsynced to a local JSONL
+    # file and acknowledged right away; a background worker flushes them per worksheet
+    # with one batched append and retries with backoff until the sheet accepts them.
+    # Entries survive restarts, so a row is appended at least once.
+    # Every server process keeps its own journal file next to `path`, held with an
+    # flock for as long as the process lives. A file nobody holds belongs to a process
+    # that is gone: the next journal to start takes its entries over, so they are
+    # flushed once and no live process's file is rewritten by another.
+
+    def __init__(self, path, flush, on_flushed=None, retry_delay=1, max_retry_delay=60):
+        # `flush(worksheet_name, rows)` appends the rows to the sheet,
+        # `on_flushed(worksheet_name)` runs after the rows have landed
+        self.flush = flush
+        self.on_flushed = on_flushed
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._worker = None
+        self.path, self._entries = self._claim(path)
+        self._seq = max((entry["seq"] for entry in self._entries), default=0)
+
+    @staticmethod
+    def _hold(path):
+        # the open lock file if no one else holds `path`, else None
+        lock_file = open(f"{path}.lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    def _claim(self, path):
+        # this process's journal file and its entries: the first abandoned journal
+        # found (`path` itself included, as written before journals were per process)
+        # or a new one, with the entries of any other abandoned journals moved into it
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        stem, extension = os.path.splitext(path)
+        own_path, self._lock_file, adopted = None, None, []
+        for candidate in sorted(set(glob.glob(f"{glob.escape(stem)}*{extension}")) | {path}):
+            lock_file = self._hold(candidate)
+            if lock_file is None:
+                continue
+            if own_path is None:
+                own_path, self._lock_file = candidate, lock_file
+            else:
+                adopted.append((candidate, lock_file))
+
+        if own_path is None:
+            own_path = f"{stem}-{os.getpid()}-{time.time_ns()}{extension}"
+            self._lock_file = self._hold(own_path)
+
+        entries = self._read(own_path)
+        if adopted:
+            for candidate, _ in adopted:
+                entries += self._read(candidate)
+            entries = [{**entry, "seq": seq} for seq, entry in enumerate(entries, 1)]
+            self._rewrite(own_path, entries)
+            for candidate, lock_file in adopted:
+                if os.path.exists(candidate):
+                    os.remove(candidate)
+                os.remove(f"{candidate}.lock")
+                lock_file.close()
+        return own_path, entries
+
+    @staticmethod
+    def _read(path):
+        if not os.path.exists(path):
+            return []
+        entries = []
+        with open(path) as f:
+            for line in f:
+                # a torn last line means that submit never returned
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+        return entries
+
+    @staticmethod
+    def _rewrite(path, entries):
+        # called with the lock held, on a journal file this process holds
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def submit(self, worksheet_name, row):
+        with self._lock:
+            self._seq += 1
+            entry = {"seq": self._seq, "worksheet": worksheet_name, "row": row}
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._entries.append(entry)
+            self._start_worker()
+            self._wakeup.notify()
+
+    def pending(self, worksheet_name):
+        with self._lock:
+            return [entry["row"] for entry in self._entries if entry["worksheet"] == worksheet_name]
+
+    def start(self):
+        # flush whatever a previous run left behind
+        with self._lock:
+            if self._entries:
+                self._start_worker()
+
+    def _start_worker(self):
+        # called with the lock held
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="write-journal", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        delay = self.retry_delay
+        while True:
+            with self._lock:
+                while not self._entries:
+                    self._wakeup.wait()
+                batches = {}
+                for entry in self._entries:
+                    batches.setdefault(entry["worksheet"], []).append(entry)
+
+            failed = False
+            for worksheet_name, entries in batches.items():
+                try:
+                    self.flush(worksheet_name, [entry["row"] for entry in entries])
+                except Exception:
+                    failed = True
+                    continue
+
+                flushed = {entry["seq"] for entry in entries}
+                with self._lock:
+                    self._entries = [entry for entry in self._entries if entry["seq"] not in flushed]
+                    if self.on_flushed is not None:
+                        self.on_flushed(worksheet_name)
+                    self._rewrite(self.path, self._entries)
+
+            if failed:
+                time.sleep(delay * random.uniform(0.5, 1.5))
+                delay = min(delay * 2, self.max_retry_delay)
+            else:
+                delay = self.retry_delay
+
+    def wait_until_flushed(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if not self._entries:
+                    return True
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)